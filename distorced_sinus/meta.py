@@ -28,6 +28,12 @@ TESTCASES = 10
 # test case ids
 TCIDS = [tc for tc in xrange(TESTCASES)]
 
+# random seed, each test case draws its series from the random state seeded with [SEED, test case id]
+SEED = 1984
+
+# number of processes setting up the test cases (None for all the cores)
+WORKERS = None
+
 # window size for generating the slided files (used in setup.py and learn.py)
 WSIZE = 8
 
@@ -40,6 +46,29 @@ STATES = 10
 # symbol bounds
 ABOUNDS = {"0": (-float("inf"), .0), "1": (.0, float("inf"))}
 
+# extension of the train and test series (".flat" for text, ".bflat" for binary, see series_utility).
+# with ".bflat", test cases set up before still read their text series
+FLAT_EXT = ".flat"
+
+# if true, the train and test series of all the test cases are views of a single master series (BASEDIR/master.bflat),
+# otherwise they are files in the test case directories (see series_utility)
+VIEWS = True
+
+# number of processes running the learning jobs in learn.py (None for all the cores, 1 to run them in order).
+# with more processes, the HMMs of the test cases are learned from per test case random states
+# (seeded by hmms_utility.SEED and the test case), so they differ from the ones learned in order
+LEARN_WORKERS = 1
+
+# if true, each learning process (and the learners it calls) is pinned to its own core (with taskset)
+PIN_CPUS = False
+
+# SQLite archive storing the models and the predictions of all the test cases (see archive_utility),
+# None to store them in the test case directories of BASEDIR and EXPDIR
+ARCHIVE = None
+
+# engine running the automata in evaluate.py ("window", "cache", "batch", "table" or "dense")
+ENGINE = "batch"
+
 # RTI+ bash command (used in learn.py)
 RTI_CMD = "/home/nino/bin/RTI/build/rti 1 0.05 {TRAIN} > {MODEL}"
 
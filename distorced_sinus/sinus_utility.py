@@ -6,11 +6,17 @@ __author__ = 'Gaetano "Gibbster" Pellegrino'
 
 """
 Utility to create sinus waves.
+getw() draws one value at a time with the random module,
+genw() draws the whole wave with a few numpy calls (from a seed or a numpy.random.RandomState),
+genw_chunks() and export_long() do it in chunks, for waves that do not fit in memory.
 """
 
 
 from math import sin, radians
 from random import randint, seed, choice
+from itertools import izip
+import series_utility as sru
+import numpy as np
 
 
 # setting the random seed
@@ -25,6 +31,12 @@ Q4 = 4
 # sinus quadrants collection
 QUADRANTS = [Q1, Q2, Q3, Q4]
 
+# lowest degree of each quadrant (indexed by quadrant - 1)
+BASES = np.array([0, 90, 180, 270])
+
+# default number of values generated at once by genw_chunks()
+CHUNK = 1 << 20
+
 # precision for floating point values
 PRECISION = 3
 
@@ -66,18 +78,107 @@ def getw(n=1000, startq=None):
             q = (q % len(QUADRANTS)) + 1
 
 
-# flat sequence loader from path
-def load_flat(path):
-    with open(path, "r") as fh:
-        for line in fh:
-            yield float(line.strip())
-
-
-def export_flat(n, path):
-    # export a sinus wave (randomly initialized) of n elements to path
-    with open(path, "w") as oh:
-        for v in getw(n):
-            oh.write(str(round(v, PRECISION)) + "\n")
+# generate a sinus wave of length n as a numpy array, with the same process as getw()
+def genw(n=1000, startq=None, rng=None):
+    return np.concatenate([vs for vs in genw_chunks(n, startq, rng)] + [np.empty(0)])
+
+
+# generate the next n values of a wave from quadrant q, with restart threshold t2.
+# it returns the values and the quadrant of the value that would follow them.
+# since a restart (Q2 -> Q1) skips exactly two quadrants, Q1 and Q3 always fall on the positions
+# with the parity of the first Q1, and Q2 and Q4 on the others. on each pair of positions,
+# a Q1 is followed by a Q1 if its Q2 is above t2 (by a Q3 otherwise), and a Q3 always by a Q1:
+# the pairs alternate Q1/Q3 and realign on Q1 after each restart.
+def gen_chunk(n, q, t2, rng):
+    # offsets of the degrees within their quadrants
+    ofs = rng.randint(0, 91, n)
+    # the wave virtually starts from the last Q1 (q - 1 positions before), without restarts
+    m = n + q - 1
+    m += m % 2
+    ext = np.zeros(m, dtype=ofs.dtype)
+    ext[q - 1:q - 1 + n] = ofs
+    rst = np.sin(np.radians(BASES[Q2 - 1] + ext[1::2])) > t2
+    rst[:(q - 1) // 2] = False
+    # pair j starts with Q1 if it is an even distance after the last pair following a restart
+    js, fst = np.arange(m // 2), np.ones(m // 2, dtype=bool)
+    fst[1:] = rst[:-1]
+    last = np.maximum.accumulate(np.where(fst, js, 0))
+    q1 = (js - last) % 2 == 0
+    qs = np.empty(m, dtype=np.intp)
+    qs[0::2] = np.where(q1, Q1, Q3) - 1
+    qs[1::2] = np.where(q1, Q2, Q4) - 1
+    qs = qs[q - 1:q - 1 + n] + 1
+    vs = np.sin(np.radians(BASES[qs - 1] + ofs))
+    if n == 0:
+        return vs, q
+    # quadrant following the last value
+    if qs[-1] == Q2 and vs[-1] > t2:
+        return vs, Q1
+    return vs, (qs[-1] % len(QUADRANTS)) + 1
+
+
+# generate a distorced sinus wave of length n in numpy arrays of at most chunk values
+def genw_chunks(n=1000, startq=None, rng=None, chunk=None):
+    rng = get_rng(rng)
+    chunk = CHUNK if chunk is None else chunk
+    # setting the starting quadrant
+    q = startq if startq in QUADRANTS else rng.randint(1, len(QUADRANTS) + 1)
+    # setting the thresholds to use to restart the signal
+    t2 = np.sin(np.radians(BASES[Q2 - 1] + rng.randint(0, 91)))
+    for i in xrange(0, n, chunk):
+        vs, q = gen_chunk(min(chunk, n - i), q, t2, rng)
+        yield vs
+
+
+# random state from a seed (SEED if None), or the given random state itself
+def get_rng(rng=None):
+    if isinstance(rng, np.random.RandomState):
+        return rng
+    return np.random.RandomState(SEED if rng is None else rng)
+
+
+def export_flat(n, path, rng=None):
+    # export a sinus wave (randomly initialized) of n elements to path (binary if it ends with .bflat).
+    # by default the wave comes from getw() (always the same one), rounded by round().
+    # with a seed or a numpy.random.RandomState rng, it comes from genw() instead, rounded by numpy.round(),
+    # which rounds halves to even: the values differ from the ones of getw() even with the same degrees.
+    if rng is None:
+        sru.export_flat([round(v, PRECISION) for v in getw(n)], path)
+    else:
+        sru.export_flat(np.round(genw(n, rng=rng), PRECISION), path)
+
+
+# export a very long wave of n elements to path in chunks (binary if it ends with .bflat), in bounded memory.
+# progress, if given, is called as progress(done, n) after each chunk.
+def export_long(n, path, rng=None, chunk=None, progress=None):
+    export_streams(n, [path], get_rng(rng), chunk, progress)
+
+
+# export several independent waves of n elements each (one for each path), generated and written together
+# chunk by chunk. the wave of paths[k] comes from the random state seeded with [sd, k] (SEED by default).
+# if sd is a random state, it generates the wave itself when there is a single path,
+# and the seeds of the random states of the waves otherwise.
+# progress, if given, is called as progress(done, n) after each chunk of all the waves.
+def export_streams(n, paths, sd=None, chunk=None, progress=None):
+    if isinstance(sd, np.random.RandomState) and len(paths) == 1:
+        rngs = [sd]
+    elif isinstance(sd, np.random.RandomState):
+        rngs = [np.random.RandomState(int(cs)) for cs in sd.randint(0, 2 ** 31 - 1, len(paths))]
+    else:
+        rngs = [np.random.RandomState([SEED if sd is None else sd, k]) for k in xrange(len(paths))]
+    gens = [genw_chunks(n, rng=rng, chunk=chunk) for rng in rngs]
+    wrs = [sru.new_writer(path) for path in paths]
+    try:
+        done = 0
+        for chunks in izip(*gens):
+            for wr, vs in izip(wrs, chunks):
+                sru.write_chunk(wr, np.round(vs, PRECISION))
+            done += len(chunks[0])
+            if progress is not None:
+                progress(done, n)
+    finally:
+        for wr in wrs:
+            sru.close_writer(wr)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+__author__ = 'Gaetano "Gibbster" Pellegrino'
+
+
+"""
+Utility to pack the artifacts of an experiment in a single SQLite archive instead of a directory tree.
+Each artifact is a row (tc, name, data) indexed by test case and name, so that it can be read or replaced directly,
+and all the artifacts (or the ones of some test cases) can be deleted at once.
+An artifact is addressed by the explicit target (archive, tc, name) (see artifact_path()), while any string is
+a plain file path: read() and write() accept both, so the models and predictions are stored in the same way
+with or without an archive. The files written by the external learners (RAI and RTI+) are moved into the archive
+with import_files() once they are done, the slided training files stay in the test case directories
+since the external learners read them.
+"""
+
+
+import sqlite3
+from os import remove
+from os.path import basename
+
+
+# seconds to wait for the archive when another process is writing it
+TIMEOUT = 60.
+
+
+# target of the artifact name of test case tc within an archive
+def artifact_path(archive, tc, name):
+    return archive, tc, name
+
+
+# true if target is an artifact within an archive (a string is always a file path)
+def is_artifact(target):
+    return isinstance(target, tuple)
+
+
+# target of name for test case tc: an artifact of archive if it is not None, the file tcdir/name otherwise
+def target(archive, tc, name, tcdir):
+    if archive is not None:
+        return artifact_path(archive, tc, name)
+    return tcdir + "/" + name
+
+
+# content of a target (artifact or file), as a string
+def read(target):
+    if is_artifact(target):
+        return get(*target)
+    with open(target, "rb") as fh:
+        return fh.read()
+
+
+# writes the string data to a target (artifact or file)
+def write(target, data):
+    if is_artifact(target):
+        put(*(target + (data,)))
+        return
+    with open(target, "wb") as fh:
+        fh.write(data)
+
+
+# moves the files in paths into the archive as artifacts of test case tc (named after the files)
+def import_files(archive, tc, paths):
+    for path in paths:
+        put(archive, tc, basename(path), read(path))
+        remove(path)
+
+
+# opens an archive (created if it does not exist)
+def connect(archive):
+    cn = sqlite3.connect(archive, timeout=TIMEOUT)
+    cn.execute("CREATE TABLE IF NOT EXISTS artifacts (tc INTEGER, name TEXT, data BLOB, PRIMARY KEY (tc, name))")
+    return cn
+
+
+# stores (or replaces) the artifact name of test case tc, data is a string
+def put(archive, tc, name, data):
+    cn = connect(archive)
+    try:
+        with cn:
+            cn.execute("INSERT OR REPLACE INTO artifacts VALUES (?, ?, ?)", (tc, name, sqlite3.Binary(data)))
+    finally:
+        cn.close()
+
+
+# content of the artifact name of test case tc, as a string
+def get(archive, tc, name):
+    cn = connect(archive)
+    try:
+        rw = cn.execute("SELECT data FROM artifacts WHERE tc = ? AND name = ?", (tc, name)).fetchone()
+    finally:
+        cn.close()
+    if rw is None:
+        raise IOError("no artifact " + name + " for test case " + str(tc) + " in " + archive)
+    return str(rw[0])
+
+
+# names of the artifacts of test case tc
+def names(archive, tc):
+    cn = connect(archive)
+    try:
+        return [str(nm) for nm, in cn.execute("SELECT name FROM artifacts WHERE tc = ? ORDER BY name", (tc,))]
+    finally:
+        cn.close()
+
+
+# deletes the artifacts of the test cases in tcs (all of them if None) whose name ends with one of suffixes
+# (any name if None), with a single statement. it returns the number of deleted artifacts.
+def delete(archive, tcs=None, suffixes=None):
+    tcs = None if tcs is None else list(tcs)
+    if (tcs is not None and not tcs) or (suffixes is not None and not suffixes):
+        return 0
+    conds, args = [], []
+    if tcs is not None:
+        conds.append("tc IN (" + ", ".join(["?"] * len(tcs)) + ")")
+        args += tcs
+    if suffixes is not None:
+        conds.append("(" + " OR ".join(["substr(name, -?) = ?"] * len(suffixes)) + ")")
+        for sf in suffixes:
+            args += [len(sf), sf]
+    cn = connect(archive)
+    try:
+        with cn:
+            return cn.execute("DELETE FROM artifacts" + (" WHERE " + " AND ".join(conds) if conds else ""),
+                              args).rowcount
+    finally:
+        cn.close()
+
+
+if __name__ == "__main__":
+    a = "/tmp/canc.sqlite"
+    write(artifact_path(a, 0, "rai.res"), "0.1\n0.2\n")
+    print names(a, 0), get(a, 0, "rai.res"), delete(a, suffixes=[".res"])
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+
+__author__ = 'Gaetano "Gibbster" Pellegrino'
+
+
+"""
+Utility to run automata compiled into flat arrays.
+A compiled model is a dict of lists indexed by a dense state index:
+"id" holds the original state identifiers, "p" the state predictions,
+"lg" and "rg" the guard bounds of the outgoing transitions (sorted by right bound),
+"ds" the indices of the destination states. "s0" is the index of the starting state (id: 0).
+"""
+
+
+import dot_utility as du
+import symbol_utility as symu
+import window_utility as wu
+import numpy as np
+from bisect import bisect_left
+
+
+# maximum number of transitions memorized by a cache (see new_cache())
+CACHE_SIZE = 100000
+
+# maximum number of entries of a window table (see tabulate_windows())
+TABLE_SIZE = 1 << 22
+
+# maximum number of entries of a dense table (see densify())
+DENSE_SIZE = 1 << 24
+
+
+# compiles a model loaded with dot_utility.load_md() (or any loader returning the same structure).
+# guards must not overlap, otherwise the bisection would disagree with the linear scan.
+def compile_md(md):
+    ids = sorted(md)
+    ix = {sta: i for i, sta in enumerate(ids)}
+    cm = {"id": ids, "p": [], "lg": [], "rg": [], "ds": [], "s0": ix.get(0, 0)}
+    for sta in ids:
+        trs = sorted(md[sta]["t"], key=lambda x: x[3])
+        for i in xrange(1, len(trs)):
+            if trs[i][2] < trs[i - 1][3]:
+                raise ValueError("overlapping guards in state " + str(sta))
+        cm["p"].append(md[sta]["p"])
+        cm["lg"].append([lg for _, _, lg, _ in trs])
+        cm["rg"].append([rg for _, _, _, rg in trs])
+        cm["ds"].append([ix[ds] for _, ds, _, _ in trs])
+    return cm
+
+
+# loader of automata stored in dot format, directly compiled
+def load_md(path):
+    return compile_md(du.load_md(path))
+
+
+# next state index given the current one and a value.
+# when no guard accepts the value we stay in the same state (as the linear scan does).
+def step(cm, sta, vl):
+    rgs = cm["rg"][sta]
+    i = bisect_left(rgs, vl)
+    if i < len(rgs) and cm["lg"][sta][i] < vl:
+        return cm["ds"][sta][i]
+    return sta
+
+
+# runs the model over a sequence of values, starting from sta (the starting state by default).
+# it returns the index of the reached state.
+def run(cm, values, sta=None):
+    if sta is None:
+        sta = cm["s0"]
+    rgs, lgs, dss = cm["rg"], cm["lg"], cm["ds"]
+    for vl in values:
+        rg = rgs[sta]
+        i = bisect_left(rg, vl)
+        if i < len(rg) and lgs[sta][i] < vl:
+            sta = dss[sta][i]
+    return sta
+
+
+# creates a cache of the transitions of a compiled model, as one dict value -> next state index for each state.
+# it memorizes the steps already taken by the windows, so that a step is a single dict lookup
+# instead of a bisection over the guards. once it holds size transitions, it is emptied.
+def new_cache(cm, size=None):
+    return {"cm": cm, "tr": [{} for _ in cm["id"]], "size": CACHE_SIZE if size is None else size,
+            "entries": 0, "lookups": 0, "misses": 0}
+
+
+# cached version of step()
+def cached_step(ch, sta, vl):
+    return cached_run(ch, (vl,), sta)
+
+
+# cached version of run()
+def cached_run(ch, values, sta=None):
+    cm, trs = ch["cm"], ch["tr"]
+    if sta is None:
+        sta = cm["s0"]
+    misses = 0
+    for vl in values:
+        try:
+            sta = trs[sta][vl]
+        except KeyError:
+            misses += 1
+            ds = trs[sta][vl] = step(cm, sta, vl)
+            sta = ds
+    ch["lookups"] += len(values)
+    if misses:
+        ch["misses"] += misses
+        ch["entries"] += misses
+        if ch["entries"] > ch["size"]:
+            ch["tr"], ch["entries"] = [{} for _ in cm["id"]], 0
+    return sta
+
+
+# hit rate of a cache (between 0 and 1)
+def hit_rate(ch):
+    return (ch["lookups"] - ch["misses"]) / float(ch["lookups"]) if ch["lookups"] else 0.
+
+
+# human readable summary of the cache counters
+def cache_report(ch):
+    return "hits: " + str(ch["lookups"] - ch["misses"]) + ", misses: " + str(ch["misses"]) + \
+           ", hit rate: " + str(round(100. * hit_rate(ch), 2)) + "%"
+
+
+# builds the cell table of a compiled model.
+# all the guard bounds split the real line in cells ]edges[k - 1], edges[k]],
+# and the next state only depends on the current state and on the cell of the value.
+# it returns the sorted edges and the (states x cells) table of next state indices.
+def tabulate(cm):
+    bounds = set()
+    for i in xrange(len(cm["id"])):
+        bounds.update(cm["lg"][i])
+        bounds.update(cm["rg"][i])
+    edges = np.array(sorted(b for b in bounds if abs(b) != float("inf")), dtype=np.float64)
+    # each cell is represented by its right bound (included in the cell)
+    reps = edges.tolist() + [float("inf")]
+    tb = np.empty((len(cm["id"]), len(reps)), dtype=np.intp)
+    for sta in xrange(len(cm["id"])):
+        for k, vl in enumerate(reps):
+            tb[sta, k] = step(cm, sta, vl)
+    return edges, tb
+
+
+# runs all the windows of a series over a next-state table (states x columns),
+# given the column of each value. it returns the state reached before each value, i.e.
+# the first wsize ones come from the prefixes of the first window,
+# then all the other windows are advanced together, one position per step.
+def run_windows(tb, s0, cols, wsize):
+    n = len(cols)
+    # first window
+    sta, hd = s0, []
+    for k in xrange(min(n, wsize)):
+        hd.append(sta)
+        sta = tb[sta, cols[k]]
+    if n <= wsize:
+        return np.array(hd, dtype=np.intp)
+    # all the other windows, without their last value, as a strided view
+    wins = wu.windows(cols[1:], wsize - 1)[:n - wsize]
+    stas = np.empty(n - wsize, dtype=np.intp)
+    stas.fill(s0)
+    for j in xrange(wsize - 1):
+        stas = tb[stas, wins[:, j]]
+    return np.concatenate((np.array(hd, dtype=np.intp), stas))
+
+
+# state index reached before each value of a series (numpy array) by its windows (see run_windows()),
+# by looking up the cell of each value with a single bisection.
+# tab is the cell table of the model (see tabulate()), built if None.
+def run_series(cm, series, wsize, tab=None):
+    edges, tb = tabulate(cm) if tab is None else tab
+    cells = np.searchsorted(edges, np.asarray(series, dtype=np.float64), side="left")
+    return run_windows(tb, cm["s0"], cells, wsize)
+
+
+# predicts a whole series (numpy array) with the same output as evaluate.rairti(),
+# through the states of run_series().
+def predict_batch(cm, series, wsize, tab=None):
+    return np.array(cm["p"], dtype=np.float64)[run_series(cm, series, wsize, tab)]
+
+
+# compiles the model into dense next-state tables over the quantized values in [lo, hi]
+# (integers, value * 10^precision), so that each step costs one read regardless of the guards.
+# it returns a dict with the table "tb" (states x values), "lo" and "bytes",
+# or None when the table would be larger than DENSE_SIZE entries.
+def densify(cm, precision, lo, hi):
+    if len(cm["id"]) * (hi - lo + 1) > DENSE_SIZE:
+        return None
+    edges, tb = tabulate(cm)
+    cells = np.searchsorted(edges, np.arange(lo, hi + 1) / float(10 ** precision), side="left")
+    dt = tb[:, cells].astype(np.int32)
+    return {"tb": dt, "lo": lo, "bytes": dt.nbytes}
+
+
+# predicts a whole series (numpy array) with the same output as evaluate.rairti(),
+# through the dense tables of densify() built over the range of the series.
+# it falls back to predict_batch() when the series is not rounded to precision
+# or its range is too wide. it returns the predictions and the dense tables (None after a fallback).
+def predict_dense(cm, series, precision, wsize):
+    series = np.asarray(series, dtype=np.float64)
+    qs = np.rint(series * 10 ** precision).astype(np.int64)
+    dn = None
+    if len(qs) and np.array_equal(qs / float(10 ** precision), series):
+        dn = densify(cm, precision, int(qs.min()), int(qs.max()))
+    if dn is None:
+        return predict_batch(cm, series, wsize), None
+    return np.array(cm["p"], dtype=np.float64)[run_windows(dn["tb"], cm["s0"], qs - dn["lo"], wsize)], dn
+
+
+# enumerates all the possible symbol windows and stores the prediction of each of them.
+# only the first wsize - 1 symbols of a window matter, so the table has asize^(wsize - 1) entries,
+# indexed by the window codes read as a base asize number (most significant first).
+# it returns None when the table would be too large, or when the guards of the model
+# are not aligned with the symbol bounds (e.g. RAI and RTI+ time models).
+# tab is the cell table of the model (see tabulate()), built if None.
+def tabulate_windows(cm, bounds, wsize, tab=None):
+    edges, tb = tabulate(cm) if tab is None else tab
+    sedges = symu.get_symbolizer(bounds)["e"]
+    asize = len(sedges) + 1
+    if asize ** (wsize - 1) > TABLE_SIZE or not set(edges.tolist()) <= set(sedges.tolist()):
+        return None
+    # each symbol lies within a single cell: we pick the one of its right bound
+    reps = np.searchsorted(edges, np.append(sedges, float("inf")), side="left")
+    stas = np.array([cm["s0"]], dtype=np.intp)
+    for _ in xrange(wsize - 1):
+        stas = tb[np.repeat(stas, asize), np.tile(reps, len(stas))]
+    return np.array(cm["p"], dtype=np.float64)[stas]
+
+
+# predicts a whole series (numpy array) with the same output as evaluate.rairti(),
+# by reading the prediction of each window from the table built by tabulate_windows().
+# it falls back to predict_batch() when the table is not available, with the same cell table.
+def predict_table(cm, series, bounds, wsize):
+    tab = tabulate(cm)
+    wt = tabulate_windows(cm, bounds, wsize, tab)
+    if wt is None:
+        return predict_batch(cm, series, wsize, tab)
+    series = np.asarray(series, dtype=np.float64)
+    n = len(series)
+    # first window
+    sta, hd = cm["s0"], []
+    for k in xrange(min(n, wsize)):
+        hd.append(cm["p"][sta])
+        sta = step(cm, sta, series[k])
+    if n <= wsize:
+        return np.array(hd, dtype=np.float64)
+    # all the other windows: index of each window, then one read each
+    sz = symu.get_symbolizer(bounds)
+    codes = symu.symbolize(sz, series).astype(np.intp)
+    ix = np.zeros(n - wsize, dtype=np.intp)
+    for j in xrange(wsize - 1):
+        ix = ix * len(sz["s"]) + codes[1 + j:1 + j + n - wsize]
+    return np.concatenate((np.array(hd, dtype=np.float64), wt[ix]))
+
+
+if __name__ == "__main__":
+    m = load_md("/home/nino/PycharmProjects/rai_experiments/sinus/data/0/rai.dot")
+    print m["id"][run(m, [0.5, -0.2, 0.9])]
@@ -5,61 +5,144 @@ __author__ = 'Gaetano "Gibbster" Pellegrino'
 
 """
 Utility to manage dot file loading and exporting.
+Loaded models are cached beside their dot file in a compact binary format (numpy .npz),
+which is used as long as it is newer than the dot file and its content hash matches.
+Models can also be loaded from and exported to the artifacts of a SQLite archive (see archive_utility),
+which are parsed from their text and never cached.
+The number ("n") and the variance ("v") of the values of a state, when known (see rti_utility.restimate_md()),
+are stored as attributes of the state, so that the online updates can resume from them.
 """
 
 import re
+import numpy as np
+import archive_utility as aru
+from hashlib import md5
+from os import rename
+from os.path import exists, getmtime
 
 
-STATE_RE = r'(-?\d+) \[shape=circle, label=\"(-?\d+)\\n(\S+)\"\];'
+STATE_RE = r'(-?\d+) \[shape=circle, label=\"(-?\d+)\\n(\S+)\"(?:, n=(\d+), v=(\S+))?\];'
 TRANS_RE = r'\t(-?\d+) -> (-?\d+) \[label=\"\](\S+), (\S+)(\]|\[)\"\];'
 
+# extension of the binary cache of a dot file
+CACHE_EXT = ".npz"
 
-# loader of automata stored in dot format
-def load_md(path):
+
+# loader of automata stored in dot format.
+# if cache is True, the binary cache is used when valid, and rebuilt otherwise (only for files).
+def load_md(path, cache=True):
+    cache = cache and not aru.is_artifact(path)
+    if cache:
+        rt = load_cache(path)
+        if rt is not None:
+            return rt
+    rt = parse_md(path)
+    if cache:
+        export_cache(rt, path)
+    return rt
+
+
+# parser of automata stored in dot format (file or archive artifact)
+def parse_md(path):
+    return parse_dot(aru.read(path))
+
+
+# parser of the text of an automaton in dot format
+def parse_dot(txt):
     rt = {}
     trp = re.compile(TRANS_RE)
     stp = re.compile(STATE_RE)
-    with open(path, "r") as rh:
-        for line in rh:
-            md = stp.match(line)
-            # state check
-            if md is not None:
-                sta = int(md.group(1))
-                pr = float(md.group(3))
-                if sta in rt:
-                    rt[sta]["p"] = pr
-                else:
-                    rt[sta] = {"p": pr, "t": []}
-            md = trp.match(line)
-            if md is not None:
-                sr = int(md.group(1))
-                ds = int(md.group(2))
-                lg = -float("inf") if "Infinity" in md.group(3) else float(md.group(3))
-                rg = float("inf") if "Infinity" in md.group(4) else float(md.group(4))
-                if ds not in rt:
-                    rt[ds] = {"p": 0., "t": []}
-                # we skip transitions to the sink state (id: -1)
-                if ds >= 0:
-                    tr = (sr, ds, lg, rg)
-                    rt[sr]["t"].append(tr)
+    for line in txt.splitlines():
+        md = stp.match(line)
+        # state check
+        if md is not None:
+            sta = int(md.group(1))
+            pr = float(md.group(3))
+            if sta in rt:
+                rt[sta]["p"] = pr
+            else:
+                rt[sta] = {"p": pr, "t": []}
+            if md.group(4) is not None:
+                rt[sta]["n"] = int(md.group(4))
+                rt[sta]["v"] = float(md.group(5))
+        md = trp.match(line)
+        if md is not None:
+            sr = int(md.group(1))
+            ds = int(md.group(2))
+            lg = -float("inf") if "Infinity" in md.group(3) else float(md.group(3))
+            rg = float("inf") if "Infinity" in md.group(4) else float(md.group(4))
+            if ds not in rt:
+                rt[ds] = {"p": 0., "t": []}
+            # we skip transitions to the sink state (id: -1)
+            if ds >= 0:
+                tr = (sr, ds, lg, rg)
+                rt[sr]["t"].append(tr)
+    return rt
+
+
+# content hash of a file
+def file_hash(path):
+    with open(path, "rb") as fh:
+        return md5(fh.read()).hexdigest()
+
+
+# stores a model loaded with parse_md() in the binary cache of the dot file in path.
+# states and transitions are flattened in arrays, keeping the order of the transitions.
+def export_cache(rt, path):
+    sts = sorted(rt)
+    trs = [tr for sta in sts for tr in rt[sta]["t"]]
+    tmp = path + CACHE_EXT + ".tmp"
+    with open(tmp, "wb") as ch:
+        np.savez(ch,
+                 md5=np.array(file_hash(path)),
+                 sta=np.array(sts, dtype=np.int64),
+                 p=np.array([rt[sta]["p"] for sta in sts], dtype=np.float64),
+                 n=np.array([rt[sta].get("n", -1) for sta in sts], dtype=np.int64),
+                 v=np.array([rt[sta].get("v", 0.) for sta in sts], dtype=np.float64),
+                 src=np.array([tr[0] for tr in trs], dtype=np.int64),
+                 ds=np.array([tr[1] for tr in trs], dtype=np.int64),
+                 lg=np.array([tr[2] for tr in trs], dtype=np.float64),
+                 rg=np.array([tr[3] for tr in trs], dtype=np.float64))
+    rename(tmp, path + CACHE_EXT)
+
+
+# loads a model from the binary cache of the dot file in path.
+# it returns None if the cache is missing, older than the dot file, or its hash does not match.
+def load_cache(path):
+    cp = path + CACHE_EXT
+    if not exists(cp) or getmtime(cp) < getmtime(path):
+        return None
+    try:
+        with np.load(cp) as ch:
+            if str(ch["md5"]) != file_hash(path):
+                return None
+            rt = {sta: {"p": pr, "t": []} for sta, pr in zip(ch["sta"].tolist(), ch["p"].tolist())}
+            # states without counts are stored with n = -1
+            for sta, n, var in zip(ch["sta"].tolist(), ch["n"].tolist(), ch["v"].tolist()):
+                if n >= 0:
+                    rt[sta]["n"], rt[sta]["v"] = n, var
+            for tr in zip(ch["src"].tolist(), ch["ds"].tolist(), ch["lg"].tolist(), ch["rg"].tolist()):
+                rt[tr[0]]["t"].append(tr)
+    except (IOError, KeyError, ValueError):
+        return None
     return rt
 
 
-# export a model loaded with load_alpha_md() or load_time_md() into .dot format
+# export a model loaded with load_alpha_md() or load_time_md() into .dot format (file or archive artifact)
 def export_md(rt, path):
-    with open(path, "w") as eh:
-        eh.write("digraph a {")
-        for sta in rt:
-            # we skip the sink
-            ln = "\n" + str(sta) + " [shape=circle, label=\"" + str(sta) + "\\n" + str(rt[sta]["p"]) + "\"];"
-            eh.write(ln)
-            for _, ds, lg, rg in rt[sta]["t"]:
-                # we skip transition to the sink
-                fl = "]" + str(lg) if lg != -float("inf") else "]-Infinity"
-                fr = str(rg) + "]" if rg != float("inf") else "Infinity["
-                ln = "\n\t" + str(sta) + " -> " + str(ds) + " [label=\"" + fl + ", " + fr + "\"];"
-                eh.write(ln)
-        eh.write("\n}")
+    lines = ["digraph a {"]
+    for sta in rt:
+        # we skip the sink
+        # counts and variance only if known
+        st = ", n=" + str(rt[sta]["n"]) + ", v=" + str(rt[sta]["v"]) if "n" in rt[sta] else ""
+        lines.append(str(sta) + " [shape=circle, label=\"" + str(sta) + "\\n" + str(rt[sta]["p"]) + "\"" + st + "];")
+        for _, ds, lg, rg in rt[sta]["t"]:
+            # we skip transition to the sink
+            fl = "]" + str(lg) if lg != -float("inf") else "]-Infinity"
+            fr = str(rg) + "]" if rg != float("inf") else "Infinity["
+            lines.append("\t" + str(sta) + " -> " + str(ds) + " [label=\"" + fl + ", " + fr + "\"];")
+    lines.append("}")
+    aru.write(path, "\n".join(lines))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+
+__author__ = 'Gaetano "Gibbster" Pellegrino'
+
+
+"""
+Utility to export a flat file to all the sliding window training files in a single pass.
+Each format is a function taking a series (numpy array) and the window size,
+and returning the content of the file as an iterator of strings.
+"""
+
+
+import rai_utility as rai
+import rti_utility as rti
+import window_utility as wu
+
+
+# buffer size of the writers (bytes)
+BUFSIZE = 1 << 20
+
+# registered formats
+FORMATS = {"rai": rai.format_sw, "rtisy": rti.format_alpha_sw, "rtitm": rti.format_time_sw}
+
+
+# registers a new format (or replaces an existing one)
+def register(name, fmt):
+    FORMATS[name] = fmt
+
+
+# reads the flat file in inpath once, and exports it to every format in paths (dict format -> path)
+def export_sws(inpath, wsize, paths):
+    series = wu.load_series(inpath)
+    for name, path in paths.items():
+        with open(path, "w", BUFSIZE) as th:
+            th.writelines(FORMATS[name](series, wsize))
+
+
+if __name__ == "__main__":
+    d = "/home/nino/PycharmProjects/rai_experiments/sinus/data8/0/"
+    export_sws(d + "train.flat", 8, {"rai": d + "rai.sw", "rtisy": d + "rtisy.sw", "rtitm": d + "rtitm.sw"})
@@ -9,6 +9,8 @@ Utility to train and test HMMs.
 import pickle as pk
 import warnings as wr
 import numpy as np
+import series_utility as sru
+import archive_utility as aru
 from hmmlearn.hmm import GaussianHMM
 from statsmodels import ConvergenceWarning
 
@@ -21,74 +23,68 @@ wr.simplefilter(action='ignore', category=RuntimeWarning)
 WSIZE = 16
 # number of states to use in HMMs inferred models
 STATES = 10
+# random seed
+SEED = 1984
 
-np.random.seed(1984)
-
-
-# flat sequence loader from path
-def load_flat(path):
-    with open(path, "r") as fh:
-        for line in fh:
-            yield float(line.strip())
+np.random.seed(SEED)
 
 
 # flat_path_tr is the path to a flat train sequence
-# md_path_out is the file path where the model will get stored permanently
+# md_path is the file path (or archive artifact) where the model will get stored permanently
 def train(flat_path_tr, md_path):
-    tr = [vl for vl in load_flat(flat_path_tr)]
+    tr = sru.load_series(flat_path_tr)
     n_tr, sw_tr = len(tr) - WSIZE + 1, []
     for i in xrange(n_tr):
         sw_tr.append(tr[i:i + WSIZE])
     sw_tr = np.array(sw_tr).flatten().reshape(n_tr * WSIZE, 1)
     len_tr = [WSIZE for _ in xrange(n_tr)]
     md = GaussianHMM(STATES, covariance_type="diag", n_iter=1000).fit(sw_tr, len_tr)
-    pk.dump(md, open(md_path, "wb"))
+    aru.write(md_path, pk.dumps(md))
     return md
 
 
-# md_path_out is the file path where the model is stored permanently (see train())
+# md_path is the file path (or archive artifact) where the model is stored permanently (see train())
 # flat_path_ts is the path to a testing flat sequence
 # flat_path_out is a path where the results of the predictions will be stored as a flat sequence
 def evaluate(md_path, flat_path_ts, flat_path_out):
-    md = pk.load(open(md_path, "rb"))
-    ts = [vl for vl in load_flat(flat_path_ts)]
+    md = pk.loads(aru.read(md_path))
+    ts = sru.load_series(flat_path_ts)
     n_ts, sw_ts = len(ts) - WSIZE + 1, []
     for i in xrange(n_ts):
         sw_ts.append(ts[i:i + WSIZE])
     sw_ts = np.array(sw_ts)
-    with open(flat_path_out, "w") as oh:
-        for i in xrange(WSIZE):
-            oh.write(str(0.) + "\n")
-        for i in xrange(n_ts - 1):
-            # probability of states in each time step
-            prob = md.predict_proba(sw_ts[i, :].reshape(WSIZE, 1))
-            prob_next_state = np.dot(prob[-1, :], md.transmat_)
-            # print prob_next_state
-            prd = 0.
-            for j in xrange(STATES):
-                prd += prob_next_state[j] * md.means_[j]
-            oh.write(str(prd[0]) + "\n")
-
-
-# exports a model learned with GaussianHHM of hmmlearn library
+    prds = [0. for _ in xrange(WSIZE)]
+    for i in xrange(n_ts - 1):
+        # probability of states in each time step
+        prob = md.predict_proba(sw_ts[i, :].reshape(WSIZE, 1))
+        prob_next_state = np.dot(prob[-1, :], md.transmat_)
+        # print prob_next_state
+        prd = 0.
+        for j in xrange(STATES):
+            prd += prob_next_state[j] * md.means_[j]
+        prds.append(prd[0])
+    sru.export_res(prds, flat_path_out)
+
+
+# exports a model learned with GaussianHHM of hmmlearn library (to a file or archive artifact)
 def export_md(hmm, path, ss=.0, tr=.2):
-    with open(path, "w") as eh:
-        # getting the data
-        trans = hmm.transmat_
-        init = hmm.startprob_
-        means = hmm.means_
-        # priting them in dot format
-        eh.write("digraph a {")
-        for s0 in xrange(len(means)):
-            ri = round(init[s0], 3)
-            if ri > ss:
-                rm = round(means[s0][0], 3)
-                eh.write("\n" + str(s0) + " [shape=circle, label=\"" + str(s0) + "\\nI=" + str(ri) + "\\nP=" + str(rm) + "\"];")
-                for s1 in xrange(len(means)):
-                    tp = round(trans[s0][s1], 3)
-                    if tp > tr:
-                        eh.write("\n\t" + str(s0) + " -> " + str(s1) + " [label=\"" + str(tp) + "\"];")
-        eh.write("\n}")
+    # getting the data
+    trans = hmm.transmat_
+    init = hmm.startprob_
+    means = hmm.means_
+    # priting them in dot format
+    lines = ["digraph a {"]
+    for s0 in xrange(len(means)):
+        ri = round(init[s0], 3)
+        if ri > ss:
+            rm = round(means[s0][0], 3)
+            lines.append(str(s0) + " [shape=circle, label=\"" + str(s0) + "\\nI=" + str(ri) + "\\nP=" + str(rm) + "\"];")
+            for s1 in xrange(len(means)):
+                tp = round(trans[s0][s1], 3)
+                if tp > tr:
+                    lines.append("\t" + str(s0) + " -> " + str(s1) + " [label=\"" + str(tp) + "\"];")
+    lines.append("}")
+    aru.write(path, "\n".join(lines))
 
 
 if __name__ == "__main__":
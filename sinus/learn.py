@@ -15,6 +15,10 @@ import rti_utility as rtu
 import dot_utility as dtu
 import sarimax_utility as sxu
 import hmms_utility as hmu
+import series_utility as sru
+import archive_utility as aru
+from multiprocessing import Pool, Queue, cpu_count
+import numpy as np
 
 
 # only cleans the files produced by learn()
@@ -25,8 +29,16 @@ def clean():
         tcdir = mt.BASEDIR + "/" + str(tc)
         # cleaning starts
         for item in os.listdir(tcdir):
-            if item.endswith(".rti") or item.endswith(".dot") or item.endswith(".md") or item.endswith(".bin"):
+            if item.endswith(".rti") or item.endswith(".dot") or item.endswith(".md") or item.endswith(".bin") or \
+                    item.endswith(dtu.CACHE_EXT):
                 os.remove(os.path.join(tcdir, item))
+    # the models in the archive are deleted at once
+    if mt.ARCHIVE is not None and os.path.exists(mt.ARCHIVE):
+        aru.delete(mt.ARCHIVE, mt.TCIDS, [".rti", ".dot", ".bin"])
+
+
+# techniques learned for each test case, in the order of the jobs
+TECHNIQUES = ["RAI", "RTISY", "RTITM", "ARMA", "ARIMA", "HMM"]
 
 
 # learns automata for all the test cases
@@ -37,10 +49,11 @@ def learn():
     # 4) learn ARMA model
     # 5) learn ARIMA model
     # 6) learn HMM model
+    # each (test case, technique) pair is an independent job, run by a pool of LEARN_WORKERS processes
     # ----------------------------------------------------------
     # setting the time infos
     times = {}
-    # setting general parameters for all the utility moduli called in this script
+    # setting general parameters for all the utility moduli called in this script (inherited by the workers)
     rtu.PRECISION = mt.PRECISION
     rtu.ABOUNDS = mt.ABOUNDS
     rtu.WSIZE = mt.WSIZE
@@ -48,73 +61,103 @@ def learn():
     rtu.ASIZE = mt.ASIZE
     hmu.WSIZE, hmu.STATES = mt.WSIZE, mt.STATES
     sxu.AR = mt.WSIZE
-    for tc in mt.TCIDS:
-        print "learning automata for test case", tc
-        print "--------------------------------------------"
-        # defining the time structure
-        tc_time = {}
-        # setting the base directory for test case tc
-        tcdir = mt.BASEDIR + "/" + str(tc)
-        # first it learns RAI model
+    jobs = [(tc, tch) for tc in mt.TCIDS for tch in TECHNIQUES]
+    if mt.LEARN_WORKERS == 1:
+        if mt.PIN_CPUS:
+            pin_cpu(0)
+        done = map(learn_job, jobs)
+    else:
+        workers = cpu_count() if mt.LEARN_WORKERS is None else mt.LEARN_WORKERS
+        # each worker takes its own core from the queue
+        cpus = Queue()
+        for k in xrange(workers):
+            cpus.put(k % cpu_count())
+        pl = Pool(workers, pin_worker if mt.PIN_CPUS else None, (cpus,) if mt.PIN_CPUS else ())
+        try:
+            done = pl.map(learn_job, jobs, 1)
+        finally:
+            pl.close()
+            pl.join()
+    # defining the time structure
+    for tc, tch, delta_time in done:
+        times.setdefault(tc, {})[tch] = delta_time
+    pk.dump(times, open(mt.BASEDIR + "/times.bin", "wb"))
+    return times
+
+
+# pins the calling process to the core cpu.
+# python 2 has no os.sched_setaffinity, so we rely on taskset (the external learners inherit the affinity).
+# it returns False (with a warning) if taskset failed, the process is left unpinned in that case.
+def pin_cpu(cpu):
+    if os.system("taskset -pc " + str(cpu) + " " + str(os.getpid()) + " > /dev/null") != 0:
+        print "warning: cannot pin process", os.getpid(), "to core", cpu
+        return False
+    return True
+
+
+# initializer of the learning workers, pinning each one to the next core of the queue cpus
+def pin_worker(cpus):
+    pin_cpu(cpus.get())
+
+
+# target of the model name (e.g. "rai.dot") of test case tc, within meta.ARCHIVE if it is set
+def md_path(tc, name):
+    return aru.target(mt.ARCHIVE, tc, name, mt.BASEDIR + "/" + str(tc))
+
+
+# learns the model of technique tch for test case tc.
+# it returns the test case, the technique and the learning time (measured within the worker).
+# with meta.ARCHIVE, the models are stored in the archive: the ones written by the external learners
+# are moved there once they are done (the slided training files stay in the test case directory).
+def learn_job(job):
+    tc, tch = job
+    print "learning", tch, "for test case", tc
+    # setting the base directory for test case tc
+    tcdir = mt.BASEDIR + "/" + str(tc)
+    flatr = sru.series_path(mt.BASEDIR, tc, "train", mt.FLAT_EXT)
+    if tch == "RAI":
+        # RAI model
         raitr = tcdir + "/rai.sw"
         raimd = tcdir + "/rai.dot"
         cmd = mt.RAI_CMD.format(TRAIN=raitr, MODEL=raimd, ALPHABET_SIZE=mt.ASIZE, PREFIX_LENGTH=mt.WSIZE / 2)
         start_time = time.time()
         os.system(cmd)
         delta_time = time.time() - start_time
-        tc_time["RAI"] = delta_time
-        # second we learn RTI+ model with alphabet
-        flatr = tcdir + "/train.flat"
-        # -------------------------------------------
-        rtitr = tcdir + "/rtisy.sw"
-        rtiou = tcdir + "/rtisy.rti"
-        rtimd = tcdir + "/rtisy.dot"
-        cmd = mt.RTI_CMD.format(TRAIN=rtitr, MODEL=rtiou)
-        start_time = time.time()
-        os.system(cmd)
-        delta_time = time.time() - start_time
-        tc_time["RTISY"] = delta_time
-        m = rtu.load_alpha_md(rtiou)
-        m = rtu.restimate_md(m, flatr)
-        dtu.export_md(m, rtimd)
-        # third we learn RTI+ model with time
-        rtitr = tcdir + "/rtitm.sw"
-        rtiou = tcdir + "/rtitm.rti"
-        rtimd = tcdir + "/rtitm.dot"
+        if mt.ARCHIVE is not None:
+            aru.import_files(mt.ARCHIVE, tc, [raimd])
+    elif tch == "RTISY" or tch == "RTITM":
+        # RTI+ model with alphabet or with time
+        nm = tch.lower()
+        rtitr = tcdir + "/" + nm + ".sw"
+        rtiou = tcdir + "/" + nm + ".rti"
+        rtimd = md_path(tc, nm + ".dot")
         cmd = mt.RTI_CMD.format(TRAIN=rtitr, MODEL=rtiou)
         start_time = time.time()
         os.system(cmd)
         delta_time = time.time() - start_time
-        tc_time["RTITM"] = delta_time
-        m = rtu.load_time_md(rtiou)
+        m = rtu.load_alpha_md(rtiou) if tch == "RTISY" else rtu.load_time_md(rtiou)
         m = rtu.restimate_md(m, flatr)
         dtu.export_md(m, rtimd)
-        # fourth we learn ARMA model
-        sxu.D = False
-        arma_md = tcdir + "/arma.bin"
-        start_time = time.time()
-        sxu.train(flatr, arma_md)
-        delta_time = time.time() - start_time
-        tc_time["ARMA"] = delta_time
-        # fifth, we learn ARIMA model
-        sxu.D = True
-        arima_md = tcdir + "/arima.bin"
+        if mt.ARCHIVE is not None:
+            aru.import_files(mt.ARCHIVE, tc, [rtiou])
+    elif tch == "ARMA" or tch == "ARIMA":
+        # ARMA or ARIMA model
+        sxu.D = tch == "ARIMA"
         start_time = time.time()
-        sxu.train(flatr, arima_md)
+        sxu.train(flatr, md_path(tc, tch.lower() + ".bin"))
         delta_time = time.time() - start_time
-        tc_time["ARIMA"] = delta_time
-        # sixth we learn HMM model
-        hmm_md = tcdir + "/hmm.bin"
-        hmm_dot = tcdir + "/hmm.dot"
+    else:
+        # HMM model. with a pool, the random state of each test case is seeded so that it does not depend
+        # on the jobs run before by the same worker (in order, the random state seeded by hmms_utility is shared)
+        hmm_md = md_path(tc, "hmm.bin")
+        hmm_dot = md_path(tc, "hmm.dot")
+        if mt.LEARN_WORKERS != 1:
+            np.random.seed([hmu.SEED, tc])
         start_time = time.time()
         md = hmu.train(flatr, hmm_md)
         delta_time = time.time() - start_time
-        tc_time["HMM"] = delta_time
         hmu.export_md(md, hmm_dot)
-        # updating the time structure
-        times[tc] = tc_time
-    pk.dump(times, open(mt.BASEDIR + "/times.bin", "wb"))
-    return times
+    return tc, tch, delta_time
 
 
 def show_times(tm_data):
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+__author__ = 'Gaetano "Gibbster" Pellegrino'
+
+
+"""
+Utility to keep the predictions of an automaton up to date while new observations arrive.
+An updater wraps a model loaded with dot_utility.load_md() (or with a RTI+ loader):
+each new value is the target of the window made of the wsize - 1 values before it,
+so it updates the running mean of the state reached by that window.
+The model is exported in dot format every given number of updates, with the counts and the variances of its states,
+so that an updater created from a checkpoint resumes from them.
+"""
+
+
+import automaton_utility as au
+import dot_utility as du
+import stats_utility as stu
+from collections import deque
+from os import rename
+
+
+# number of updates between two checkpoints
+EVERY = 1000
+
+
+# creates an updater for the model md.
+# path is where the checkpoints are exported (None to disable them).
+# prior is the weight of the current predictions, as a number of observations:
+# by default the counts ("n") left by rti_utility.restimate_md() and stored in the dot file, 0 if missing.
+def new_updater(md, wsize, path=None, every=None, prior=None):
+    cm = au.compile_md(md)
+    acs = {}
+    for sta in md:
+        n = md[sta].get("n", 0) if prior is None else prior
+        acs[sta] = stu.new_acc(n, md[sta]["p"], md[sta].get("v", 0.))
+    return {"md": md,
+            "ch": au.new_cache(cm),
+            "acs": acs,
+            "win": deque(maxlen=wsize - 1),
+            "path": path,
+            "every": EVERY if every is None else every,
+            "updates": 0}
+
+
+# state reached by the current window
+def current_state(up):
+    return up["ch"]["cm"]["id"][au.cached_run(up["ch"], up["win"])]
+
+
+# prediction for the next observation (None until wsize - 1 values have been seen)
+def predict(up):
+    if len(up["win"]) < up["win"].maxlen:
+        return None
+    sta = current_state(up)
+    return stu.mean(up["acs"][sta]) if up["acs"][sta]["n"] else up["md"][sta]["p"]
+
+
+# updates the model with a new observation
+def update(up, vl):
+    if len(up["win"]) == up["win"].maxlen:
+        stu.update_acc(up["acs"][current_state(up)], vl)
+        up["updates"] += 1
+        if up["path"] is not None and up["updates"] % up["every"] == 0:
+            checkpoint(up)
+    up["win"].append(vl)
+
+
+# updates the model with a chunk of observations (any iterable)
+def update_chunk(up, vls):
+    for vl in vls:
+        update(up, vl)
+
+
+# copies the running statistics into the model, and returns it
+def sync(up):
+    md = up["md"]
+    for sta, acc in up["acs"].items():
+        if acc["n"]:
+            md[sta]["p"] = stu.mean(acc)
+            md[sta]["n"] = acc["n"]
+            md[sta]["v"] = stu.variance(acc)
+    return md
+
+
+# exports the up to date model into path (or into the updater path).
+# the dot file is replaced at once, so readers never see a partial model.
+def checkpoint(up, path=None):
+    path = up["path"] if path is None else path
+    du.export_md(sync(up), path + ".tmp")
+    rename(path + ".tmp", path)
+
+
+if __name__ == "__main__":
+    import series_utility as sru
+    p = "/home/nino/PycharmProjects/rai_experiments/stratosphere/data40/0/rtitm.dot"
+    f = "/home/nino/PycharmProjects/rai_experiments/stratosphere/data40/0/test.flat"
+    u = new_updater(du.load_md(p), 40, p + ".online", 100)
+    update_chunk(u, sru.load_flat(f))
+    print predict(u)
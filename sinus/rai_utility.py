@@ -9,20 +9,20 @@ Uitility to interface RAI with this experiment.
 """
 
 
-import sinus.sinus_utility as su
+import window_utility as wu
+
+
+# RAI sliding window training file of a series (numpy array), as an iterator of strings
+def format_sw(series, wsize):
+    tokens = [str(vl) for vl in series.tolist()]
+    for i, ln in enumerate(wu.window_lines(tokens, wsize)):
+        yield ln if i == 0 else "\n" + ln
 
 
 # utility to export a flat file to RAI sliding window training file
 def export_sw(inpath, wsize, oupath):
     with open(oupath, "w") as th:
-        window = []
-        for vl in su.load_flat(inpath):
-            if len(window) < wsize:
-                window.append(str(vl))
-            else:
-                th.write(" ".join(window) + "\n")
-                window = window[1:] + [str(vl)]
-        th.write(" ".join(window))
+        th.writelines(format_sw(wu.load_series(inpath), wsize))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+__author__ = 'Gaetano "Gibbster" Pellegrino'
+
+
+"""
+Utility to parse large text files in parallel.
+A file is split in byte ranges aligned to the beginning of its lines, each range is parsed by a worker process,
+and the partial results come back in the order of the file, to be merged by the caller.
+The parsers are called as parser((path, start, end) + args), so they must be defined at module level.
+State shared by all the ranges (e.g. a large lookup table) should be set by an initializer instead of args,
+so that it reaches each worker once rather than with every range.
+"""
+
+
+from multiprocessing import Pool, cpu_count
+from os.path import getsize
+
+
+# maximum size in bytes of a range (more ranges than workers keep all the workers busy)
+RANGE_SIZE = 1 << 26
+
+
+# splits a file from byte start in at most n ranges [(start, end)], each one starting at the beginning of a line
+def byte_ranges(path, n, start=0):
+    size = getsize(path)
+    bounds = [start]
+    with open(path, "rb") as fh:
+        for k in xrange(1, n):
+            of = start + (size - start) * k // n
+            if of <= bounds[-1]:
+                continue
+            # moving to the beginning of the next line (of itself if a line ends at of - 1)
+            fh.seek(of - 1)
+            fh.readline()
+            of = fh.tell()
+            if bounds[-1] < of < size:
+                bounds.append(of)
+    bounds.append(max(size, start))
+    return zip(bounds[:-1], bounds[1:])
+
+
+# lines (with their end of line) within the byte range [start, end) of a file
+def range_lines(path, start, end):
+    with open(path, "rb") as fh:
+        fh.seek(start)
+        while start < end:
+            line = fh.readline()
+            if not line:
+                break
+            start += len(line)
+            yield line
+
+
+# parses the ranges of a file with a pool of workers (all the cores if None, in this process if 1),
+# and yields their results in the order of the file. the file is read from byte start (e.g. after a header).
+# initializer, if given, is called as initializer(*initargs) once in each worker (or in this process).
+def imap_ranges(path, parser, args=(), workers=None, start=0, initializer=None, initargs=()):
+    workers = cpu_count() if workers is None else workers
+    n = max(workers, (getsize(path) - start) // RANGE_SIZE + 1)
+    tasks = [(path, lo, hi) + tuple(args) for lo, hi in byte_ranges(path, n, start)]
+    if workers == 1:
+        if initializer is not None:
+            initializer(*initargs)
+        for tk in tasks:
+            yield parser(tk)
+        return
+    pl = Pool(workers, initializer, initargs)
+    try:
+        for rs in pl.imap(parser, tasks):
+            yield rs
+    finally:
+        pl.terminate()
+        pl.join()
@@ -10,8 +10,14 @@ Utility to interface RTI+ with this experiment.
 
 
 # import meta as mt
-import sinus.sinus_utility as su
+import series_utility as sru
+import automaton_utility as au
+import stats_utility as stu
+import symbol_utility as symu
+import window_utility as wu
+import numpy as np
 import re
+from itertools import izip
 
 
 # regular expressions
@@ -35,57 +41,48 @@ WSIZE = 16
 
 
 # translate values into alphabet symbols.
-# bounds is a dict containing, for each symbol, the left and right bound in form of tuple
+# bounds is a dict containing, for each symbol, the left and right bound in form of tuple.
+# the symbolizer of bounds is built only once (see symbol_utility.get_symbolizer()).
 def get_symbol(value, bounds):
-    for sy, (lb, rb) in bounds.items():
-        if lb < value <= rb:
-            return sy
+    return symu.symbol(symu.get_symbolizer(bounds), value)
+
+
+# RTI+ sliding window training file of a series (numpy array) by using the alphabet, as an iterator of strings.
+# the header counts the windows actually present in the series.
+def format_alpha_sw(series, wsize):
+    sz = symu.symbolizer(ABOUNDS)
+    # one token for each symbol, picked by the codes of the values
+    tokens = np.array([" " + sy + " 0" for sy in sz["s"]])[symu.symbolize(sz, series)]
+    # the header
+    yield str(max(len(tokens) - wsize + 1, 1)) + " " + str(ASIZE)
+    # now the content
+    for ln in wu.window_lines(tokens, wsize, "", "\n" + str(min(wsize, len(tokens)))):
+        yield ln
+
+
+# RTI+ sliding window training file of a series (numpy array) by using time, as an iterator of strings.
+# the header counts the windows actually present in the series.
+def format_time_sw(series, wsize):
+    tokens = [" 0 " + str(int(vl * pow(10, PRECISION) + 1000.)) for vl in series.tolist()]
+    # the header
+    yield str(max(len(tokens) - wsize + 1, 1)) + " 1"
+    # now the content
+    for ln in wu.window_lines(tokens, wsize, "", "\n" + str(min(wsize, len(tokens)))):
+        yield ln
 
 
 # utility to export a flat file to RAI sliding window training file
 # by using an alphabet of 2 symbols (positive or negative)
 def export_alpha_sw(inpath, wsize, oupath):
     with open(oupath, "w") as th:
-        # writing the header
-        th.write(str(TRAINL - wsize + 1) + " " + str(ASIZE))
-        # now the content
-        window = []
-        for vl in su.load_flat(inpath):
-            sy = get_symbol(vl, ABOUNDS)
-            if len(window) < wsize:
-                window.append(sy)
-            else:
-                th.write("\n" + str(len(window)))
-                for sv in window:
-                    th.write(" " + sv + " 0")
-                window = window[1:] + [sy]
-        # handling last pending window
-        th.write("\n" + str(len(window)))
-        for sv in window:
-            th.write(" " + sv + " 0")
+        th.writelines(format_alpha_sw(wu.load_series(inpath), wsize))
 
 
 # utility to export a flat file to RTI+ sliding window training file
 # by using the time delay inferring mechanism of the algorithm
 def export_time_sw(inpath, wsize, oupath):
     with open(oupath, "w") as th:
-        # writing the header
-        th.write(str(TRAINL - wsize + 1) + " 1")
-        # now the content
-        window = []
-        for vl in su.load_flat(inpath):
-            timev = int(vl * pow(10, PRECISION) + 1000.)
-            if len(window) < wsize:
-                window.append(str(timev))
-            else:
-                th.write("\n" + str(len(window)))
-                for sv in window:
-                    th.write(" 0 " + sv)
-                window = window[1:] + [str(timev)]
-        # handling last pending window
-        th.write("\n" + str(len(window)))
-        for sv in window:
-            th.write(" 0 " + sv)
+        th.writelines(format_time_sw(wu.load_series(inpath), wsize))
 
 
 # this method loads a model, inferred by RTI+ with alphabet, in memory
@@ -167,41 +164,63 @@ def load_time_md(path):
     return rt
 
 
-# sliding window iterator given a flat file
+# loaders of RTI+ models, directly compiled (see automaton_utility.compile_md())
+def load_compiled_alpha_md(path):
+    return au.compile_md(load_alpha_md(path))
+
+
+def load_compiled_time_md(path):
+    return au.compile_md(load_time_md(path))
+
+
+# sliding window iterator given a flat file.
+# the series is loaded once, and each window is a list of python floats taken from its strided view
+# (see window_utility.windows()), which the automata run faster than numpy scalars.
 def windows_getter(path, wsize=None):
     if wsize is None:
         wsize = WSIZE
-    window = []
-    for vl in su.load_flat(path):
-        if len(window) < wsize:
-            window.append(vl)
-        else:
-            yield window
-            window = window[1:] + [vl]
-    # handling last window
-    yield window
+    for row in wu.windows(wu.load_series(path), wsize):
+        yield row.tolist()
 
 
 # estimate state probabilities by using a flat file.
-# it uses the mean value as a predictor in each state.
+# it uses the mean value as a predictor in each state (the median, estimated by a sketch, if median is True).
+# statistics are collected in one streaming pass in constant memory, and each state also gets
+# the number ("n") and the variance ("v") of its values.
+# the series is loaded once, and the states reached by all its windows are computed together over the cell table
+# of the model (see automaton_utility.run_windows()). if cache is True, each window is run instead,
+# memorizing the transitions shared by the windows (see automaton_utility.new_cache()).
 # important! it updates the model provided in input.
-def restimate_md(md, path):
-    # this dict contains the values collected in each state
-    stvs = {sta: [] for sta in md}
+def restimate_md(md, path, cache=False, median=False):
+    # running statistics of the values collected in each state
+    acs = {sta: stu.new_acc() for sta in md}
+    sks = {sta: stu.new_sketch() for sta in md} if median else None
+    # the model is compiled once, so that each step is a bisection over the guards
+    cm = au.compile_md(md)
+    ch = au.new_cache(cm) if cache else None
+    series = wu.load_series(path)
+    if ch is not None:
+        wins = (row.tolist() for row in wu.windows(series, WSIZE))
+        pairs = ((au.cached_run(ch, window[:-1]), window[-1]) for window in wins if window)
+    elif len(series):
+        # the state reached before each value: the last value of each window is its target
+        fst = min(len(series), WSIZE) - 1
+        pairs = izip(au.run_series(cm, series, WSIZE)[fst:].tolist(), series[fst:].tolist())
+    else:
+        pairs = []
     # now we start collecting those values
-    for window in windows_getter(path):
-        sta = 0
-        for vl in window[:-1]:
-            # looking for the next state
-            for _, ds, lg, rg in md[sta]["t"]:
-                if lg < vl <= rg:
-                    sta = ds
-                    break
-        stvs[sta].append(window[-1])
+    for sta, vl in pairs:
+        sta = cm["id"][sta]
+        stu.update_acc(acs[sta], vl)
+        if median:
+            stu.update_sketch(sks[sta], vl)
+    if ch is not None:
+        print "transitions cache for", path, "->", au.cache_report(ch)
     # now we can reestimate
     for sta in md:
-        # print sta, len(stvs[sta])
-        md[sta]["p"] = sum(stvs[sta]) / float(len(stvs[sta])) if stvs[sta] else 0.
+        md[sta]["p"] = stu.quantile(sks[sta]) if median else stu.mean(acs[sta])
+        md[sta]["n"] = acs[sta]["n"]
+        md[sta]["v"] = stu.variance(acs[sta])
     # ready to return
     return md
 
@@ -11,6 +11,8 @@ Utility for learning and testing SARIMAX models.
 
 import warnings as wr
 import pickle as pk
+import series_utility as sru
+import archive_utility as aru
 
 wr.simplefilter(action='ignore', category=FutureWarning)
 from statsmodels.tsa.statespace.sarimax import SARIMAX
@@ -24,35 +26,26 @@ D = True
 MA = 1
 
 
-# flat sequence loader from path
-def load_flat(path):
-    with open(path, "r") as fh:
-        for line in fh:
-            yield float(line.strip())
-
-
 # flat_path_tr is the path to a flat train sequence
-# md_path_out is the file path where the model will get stored permanently
+# md_path is the file path (or archive artifact) where the model will get stored permanently
 def train(flat_path_tr, md_path):
-    tr = [vl for vl in load_flat(flat_path_tr)]
+    tr = sru.load_series(flat_path_tr)
     md = SARIMAX(tr, order=(AR, 1 if D else 0, MA), enforce_stationarity=False, enforce_invertibility=False)
     prs = md.fit(disp=0).params
-    pk.dump(prs, open(md_path, "wb"))
+    aru.write(md_path, pk.dumps(prs))
     return prs
 
 
-# md_path_out is the file path where the model is stored permanently (see train())
+# md_path is the file path (or archive artifact) where the model is stored permanently (see train())
 # flat_path_ts is the path to a testing flat sequence
 # flat_path_out is a path where the results of the predictions will be stored as a flat sequence
 def evaluate(md_path, flat_path_ts, flat_path_out):
-    prs = pk.load(open(md_path, "rb"))
-    ts = [vl for vl in load_flat(flat_path_ts)]
+    prs = pk.loads(aru.read(md_path))
+    ts = sru.load_series(flat_path_ts)
     md2 = SARIMAX(ts, order=(AR, 1 if D else 0, MA), enforce_stationarity=False, enforce_invertibility=False)
     rs = md2.filter(prs)
     # assembling the results
-    with open(flat_path_out, "w") as oh:
-        for i in xrange(len(ts)):
-            oh.write(str(rs.predict(i, i)[-1]) + "\n")
+    sru.export_res([rs.predict(i, i)[-1] for i in xrange(len(ts))], flat_path_out)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+
+__author__ = 'Gaetano "Gibbster" Pellegrino'
+
+
+"""
+Utility to load and store series, shared by all the experiments.
+Series are stored in text flat files (one value for each row), or in binary flat files (.bflat):
+a 16 bytes header (magic, version and number of values) followed by the raw values as little endian float64,
+which are opened with numpy.memmap without parsing. The format of a file is given by its extension.
+Text files are parsed by numpy in bulk, or in chunks when streaming.
+Long series can be written in chunks (see new_writer()).
+Predictions (.res files) are written as text flat files.
+A view (master.bflat@start,length) is a range of a binary master file, which is loaded as a slice of its memory map
+and written in place: the test cases of an experiment can share a single master series,
+with their views stored in the base directory (see export_views() and series_path()).
+Predictions can also be stored as text artifacts of a SQLite archive, given as (archive, tc, name) targets
+(see archive_utility).
+"""
+
+
+import numpy as np
+import cPickle as pk
+import re
+from itertools import islice
+from struct import Struct
+from os import stat
+from os.path import exists, isabs, join, relpath
+import archive_utility as aru
+
+
+# extension of text and binary flat files
+FLAT_EXT = ".flat"
+BFLAT_EXT = ".bflat"
+
+# header of binary flat files
+HEADER = Struct("<4sIQ")
+MAGIC = "BFLT"
+VERSION = 1
+
+# default number of values in each chunk when streaming a series
+CHUNK = 1 << 16
+
+# separator between the master path and the range of a view
+VIEW_SEP = "@"
+
+# a view is a path ending with @start,length (any other "@" in a path is just a character)
+VIEW_RE = re.compile(r"^(.*)" + VIEW_SEP + r"(\d+),(\d+)$")
+
+# name of the file holding the views of the test cases within a base directory
+VIEWS = "views.bin"
+
+# views loaded by series_path(), by base directory (with the size and modification time of their file)
+LOADED_VIEWS = {}
+
+
+# path of the view of length values of a master binary flat file, from the start-th one
+def view_path(master, start, length):
+    return master + VIEW_SEP + str(start) + "," + str(length)
+
+
+# true if path is a view
+def is_view(path):
+    return VIEW_RE.match(path) is not None
+
+
+# master path, start and length of a view
+def split_view(path):
+    ms, st, ln = VIEW_RE.match(path).groups()
+    return ms, int(st), int(ln)
+
+
+# true if the file in path is a binary flat file (or a view of one)
+def is_bflat(path):
+    return is_view(path) or path.endswith(BFLAT_EXT)
+
+
+# creates a binary flat file of n zeros, to be written in place through views
+def new_bflat(path, n):
+    with open(path, "wb") as oh:
+        oh.write(HEADER.pack(MAGIC, VERSION, n))
+        oh.truncate(HEADER.size + 8 * n)
+
+
+# stores the views of the test cases of basedir (dict test case -> dict name -> view).
+# their masters are stored relative to basedir, so that the whole directory can be moved.
+def export_views(views, basedir):
+    rvs = {}
+    for tc in views:
+        rvs[tc] = {}
+        for name, vw in views[tc].iteritems():
+            ms, st, ln = split_view(vw)
+            rvs[tc][name] = view_path(relpath(ms, basedir), st, ln)
+    with open(basedir + "/" + VIEWS, "wb") as vh:
+        pk.dump(rvs, vh, pk.HIGHEST_PROTOCOL)
+
+
+# views of the test cases of basedir (empty if it has none), loaded once unless their file changes
+def load_views(basedir):
+    vp = basedir + "/" + VIEWS
+    if not exists(vp):
+        LOADED_VIEWS.pop(basedir, None)
+        return {}
+    st = stat(vp)
+    ky = (st.st_size, st.st_mtime)
+    if basedir not in LOADED_VIEWS or LOADED_VIEWS[basedir][0] != ky:
+        with open(vp, "rb") as vh:
+            LOADED_VIEWS[basedir] = ky, pk.load(vh)
+    return LOADED_VIEWS[basedir][1]
+
+
+# path of the series name (e.g. "train") of test case tc: its view if basedir has one,
+# the file basedir/tc/name + ext otherwise. a binary file that does not exist falls back to
+# the text one (name + FLAT_EXT) if there is one, e.g. for test cases set up before binary files.
+def series_path(basedir, tc, name, ext=FLAT_EXT):
+    vw = load_views(basedir).get(tc, {}).get(name)
+    if vw is not None:
+        ms, st, ln = split_view(vw)
+        return view_path(ms if isabs(ms) else join(basedir, ms), st, ln)
+    path = basedir + "/" + str(tc) + "/" + name
+    if ext == BFLAT_EXT and not exists(path + ext) and exists(path + FLAT_EXT):
+        return path + FLAT_EXT
+    return path + ext
+
+
+# exports a sequence of values to a binary flat file
+def export_bflat(values, path):
+    vs = np.ascontiguousarray(values, dtype="<f8")
+    with open(path, "wb") as oh:
+        oh.write(HEADER.pack(MAGIC, VERSION, len(vs)))
+        vs.tofile(oh)
+
+
+# memory map of a binary flat file (read-only by default, mode "r+" to write it in place),
+# or the slice of the memory map of its master if path is a view
+def load_bflat(path, mode="r"):
+    if is_view(path):
+        ms, st, ln = split_view(path)
+        return load_bflat(ms, mode)[st:st + ln]
+    with open(path, "rb") as fh:
+        mg, vr, n = HEADER.unpack(fh.read(HEADER.size))
+    if mg != MAGIC or vr != VERSION:
+        raise ValueError("invalid binary flat file " + path)
+    if n == 0:
+        return np.empty(0, dtype="<f8")
+    return np.memmap(path, dtype="<f8", mode=mode, offset=HEADER.size, shape=(n,))
+
+
+# exports a sequence of values to path, in text (one value for each row) or binary format.
+# a view is written in place within its master, and must have the same length as values.
+def export_flat(values, path):
+    if is_view(path):
+        vm = load_bflat(path, "r+")
+        if len(vm) != len(values):
+            raise ValueError("view " + path + " does not have " + str(len(values)) + " values")
+        if len(vm):
+            vm[:] = values
+            vm.flush()
+    elif is_bflat(path):
+        export_bflat(values, path)
+    else:
+        export_res(values, path)
+
+
+# opens a flat file (text or binary) to be written in chunks with write_chunk(), without knowing its length.
+# the number of values of a binary file is written in its header by close_writer().
+def new_writer(path):
+    wr = {"path": path, "bin": is_bflat(path), "n": 0}
+    wr["fh"] = open(path, "wb" if wr["bin"] else "w")
+    if wr["bin"]:
+        wr["fh"].write(HEADER.pack(MAGIC, VERSION, 0))
+    return wr
+
+
+# appends a chunk of values to a flat file opened with new_writer()
+def write_chunk(wr, values):
+    if wr["bin"]:
+        vs = np.ascontiguousarray(values, dtype="<f8")
+        vs.tofile(wr["fh"])
+    else:
+        vs = values.tolist() if isinstance(values, np.ndarray) else values
+        wr["fh"].write("".join([str(vl) + "\n" for vl in vs]))
+    wr["n"] += len(vs)
+
+
+# closes a flat file opened with new_writer(), fixing the header of binary files
+def close_writer(wr):
+    if wr["bin"]:
+        wr["fh"].seek(0)
+        wr["fh"].write(HEADER.pack(MAGIC, VERSION, wr["n"]))
+    wr["fh"].close()
+
+
+# exports an iterable of chunks (sequences of values) to a flat file, keeping one chunk in memory
+def export_chunks(chunks, path):
+    wr = new_writer(path)
+    try:
+        for vs in chunks:
+            write_chunk(wr, vs)
+    finally:
+        close_writer(wr)
+    return wr["n"]
+
+
+# exports predictions (or any sequence of values) to a text flat file (or archive artifact) at once.
+# values are written with str(), numpy arrays after being converted to python floats.
+def export_res(values, path):
+    if isinstance(values, np.ndarray):
+        values = values.tolist()
+    txt = "".join([str(vl) + "\n" for vl in values])
+    aru.write(path, txt)
+
+
+# loads a series into a numpy array (memory mapped if the file is binary, parsed by numpy if text)
+def load_series(path):
+    if aru.is_artifact(path):
+        return np.fromstring(aru.read(path), dtype=np.float64, sep=" ")
+    if is_bflat(path):
+        return load_bflat(path)
+    return np.fromfile(path, dtype=np.float64, sep=" ")
+
+
+# iterates over a series in numpy arrays of at most chunk values
+def load_chunks(path, chunk=None):
+    chunk = CHUNK if chunk is None else chunk
+    if aru.is_artifact(path) or is_bflat(path):
+        vs = load_series(path)
+        for i in xrange(0, len(vs), chunk):
+            yield vs[i:i + chunk]
+    else:
+        with open(path, "r") as fh:
+            while True:
+                lines = list(islice(fh, chunk))
+                if not lines:
+                    break
+                yield np.fromstring("".join(lines), dtype=np.float64, sep=" ")
+
+
+# flat sequence loader from path (one python float at a time)
+def load_flat(path, chunk=None):
+    for vs in load_chunks(path, chunk):
+        for vl in vs.tolist():
+            yield vl
+
+
+if __name__ == "__main__":
+    export_flat([0.1, 0.2, 0.3], "/tmp/canc" + BFLAT_EXT)
+    print load_series("/tmp/canc" + BFLAT_EXT), [v for v in load_flat("/tmp/canc" + BFLAT_EXT)]
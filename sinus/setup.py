@@ -9,15 +9,19 @@ It creates 10 training sinus series of 1000 values each,
 and 10 testing sinus series of 500 values each.
 It generates a folder for each case (0 to 9).
 The file format for the series consists of a value for each row in a text file with .flat extension
-(train.flat, test.flat).
+(train.flat, test.flat), or of raw values in a binary file with .bflat extension (see meta.FLAT_EXT).
+With meta.VIEWS, train and test series are views of a single master series instead (BASEDIR/master.bflat).
 """
 
 import sinus.meta as mt
-import rai_utility as rai
+import export_utility as exu
 import rti_utility as rti
+import series_utility as sru
 import sinus.sinus_utility as su
 from os import mkdir, walk, rmdir, remove
 from os.path import exists, join
+from multiprocessing import Pool
+import numpy as np
 
 
 def clean():
@@ -33,6 +37,9 @@ def clean():
             remove(join(root, name))
         for name in dirs:
             rmdir(join(root, name))
+    # removes the archive of the models and predictions at once
+    if mt.ARCHIVE is not None and exists(mt.ARCHIVE):
+        remove(mt.ARCHIVE)
     # removes the base directories
     if exists(mt.BASEDIR):
         rmdir(mt.BASEDIR)
@@ -60,35 +67,49 @@ def setup():
         mkdir(mt.BASEDIR)
     if not exists(mt.EXPDIR):
         mkdir(mt.EXPDIR)
-    # now we can start
-    for tc in mt.TCIDS:
-        print "setting up test case", tc
-        # setting a specific seed for this test case (for the flat sequences generation)
-        su.SEED += tc
-        # setting the data directory for test case tc
-        tcdir = mt.BASEDIR + "/" + str(tc)
-        # creating the test case data directory
-        if not exists(tcdir):
-            mkdir(tcdir)
-        # creating the test case experiments directory
-        expdir = mt.EXPDIR + "/" + str(tc)
-        if not exists(expdir):
-            mkdir(expdir)
-        # setting the training paths
-        flat = tcdir + "/train.flat"
-        raisw = tcdir + "/rai.sw"
-        rtissw = tcdir + "/rtisy.sw"
-        rtitsw = tcdir + "/rtitm.sw"
-        # generating the training flat wave file
-        su.export_flat(mt.TRAINL, flat)
-        # generating the testing flat wave file
-        su.export_flat(mt.TESTL, tcdir + "/test.flat")
-        # generating training slided file for RAI
-        rai.export_sw(flat, mt.WSIZE, raisw)
-        # generating training slided file for RTI with alphabet
-        rti.export_alpha_sw(flat, mt.WSIZE, rtissw)
-        # generating training slided file for RTI with time
-        rti.export_time_sw(flat, mt.WSIZE, rtitsw)
+    # with views, the series of the test cases are written in place within the master series
+    if mt.VIEWS:
+        master, ln = mt.BASEDIR + "/master" + sru.BFLAT_EXT, mt.TRAINL + mt.TESTL
+        sru.new_bflat(master, ln * len(mt.TCIDS))
+        sru.export_views({tc: {"train": sru.view_path(master, k * ln, mt.TRAINL),
+                               "test": sru.view_path(master, k * ln + mt.TRAINL, mt.TESTL)}
+                          for k, tc in enumerate(mt.TCIDS)}, mt.BASEDIR)
+    elif exists(mt.BASEDIR + "/" + sru.VIEWS):
+        remove(mt.BASEDIR + "/" + sru.VIEWS)
+    # now we can start, the test cases are independent (the workers inherit the parameters above)
+    pl = Pool(mt.WORKERS)
+    try:
+        pl.map(setup_case, mt.TCIDS)
+    finally:
+        pl.close()
+        pl.join()
+
+
+def setup_case(tc):
+    print "setting up test case", tc
+    # random state of this test case (for the flat sequences generation), it does not depend on the other ones.
+    # with it, the series are generated by the numpy generator of sinus_utility (see export_flat())
+    rng = np.random.RandomState([mt.SEED, tc])
+    # setting the data directory for test case tc
+    tcdir = mt.BASEDIR + "/" + str(tc)
+    # creating the test case data directory
+    if not exists(tcdir):
+        mkdir(tcdir)
+    # creating the test case experiments directory
+    expdir = mt.EXPDIR + "/" + str(tc)
+    if not exists(expdir):
+        mkdir(expdir)
+    # setting the training paths
+    flat = sru.series_path(mt.BASEDIR, tc, "train", mt.FLAT_EXT)
+    raisw = tcdir + "/rai.sw"
+    rtissw = tcdir + "/rtisy.sw"
+    rtitsw = tcdir + "/rtitm.sw"
+    # generating the training flat wave file
+    su.export_flat(mt.TRAINL, flat, rng)
+    # generating the testing flat wave file
+    su.export_flat(mt.TESTL, sru.series_path(mt.BASEDIR, tc, "test", mt.FLAT_EXT), rng)
+    # generating training slided files for RAI, RTI with alphabet and RTI with time (in a single pass)
+    exu.export_sws(flat, mt.WSIZE, {"rai": raisw, "rtisy": rtissw, "rtitm": rtitsw})
 
 
 if __name__ == "__main__":
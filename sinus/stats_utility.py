@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+__author__ = 'Gaetano "Gibbster" Pellegrino'
+
+
+"""
+Utility to compute statistics over streams of values in constant memory.
+An accumulator keeps count, sum and variance (Welford's method),
+a sketch estimates a quantile with the P-square algorithm (Jain and Chlamtac, 1985) by using 5 markers.
+"""
+
+
+# creates an accumulator, empty by default or as if it had already seen n values
+# with the given mean and variance
+def new_acc(n=0, mn=0., var=0.):
+    return {"n": n, "s": mn * n, "mean": mn, "m2": var * n}
+
+
+# updates an accumulator with a new value
+def update_acc(acc, vl):
+    acc["n"] += 1
+    acc["s"] += vl
+    dl = vl - acc["mean"]
+    acc["mean"] += dl / acc["n"]
+    acc["m2"] += dl * (vl - acc["mean"])
+
+
+# mean of the values seen by an accumulator (0. if none).
+# it is computed from the running sum, so it is the same as sum(values) / len(values).
+def mean(acc):
+    return acc["s"] / float(acc["n"]) if acc["n"] else 0.
+
+
+# population variance of the values seen by an accumulator (0. if none)
+def variance(acc):
+    return acc["m2"] / acc["n"] if acc["n"] else 0.
+
+
+# creates an empty sketch for the q-quantile (the median by default)
+def new_sketch(q=.5):
+    return {"q": q,
+            "h": [],
+            "pos": [1, 2, 3, 4, 5],
+            "des": [1., 1. + 2. * q, 1. + 4. * q, 3. + 2. * q, 5.],
+            "inc": [0., q / 2., q, (1. + q) / 2., 1.]}
+
+
+# updates a sketch with a new value
+def update_sketch(sk, vl):
+    h, pos, des = sk["h"], sk["pos"], sk["des"]
+    # the first 5 values are the initial marker heights
+    if len(h) < 5:
+        h.append(vl)
+        h.sort()
+        return
+    # finding the cell of the value, and updating the extreme markers
+    if vl < h[0]:
+        h[0], k = vl, 0
+    elif vl >= h[4]:
+        h[4], k = vl, 3
+    else:
+        k = 0
+        while vl >= h[k + 1]:
+            k += 1
+    for i in xrange(k + 1, 5):
+        pos[i] += 1
+    for i in xrange(5):
+        des[i] += sk["inc"][i]
+    # adjusting the heights of the middle markers
+    for i in xrange(1, 4):
+        dl = des[i] - pos[i]
+        if (dl >= 1 and pos[i + 1] - pos[i] > 1) or (dl <= -1 and pos[i - 1] - pos[i] < -1):
+            d = 1 if dl > 0 else -1
+            # piecewise parabolic prediction
+            hp = h[i] + d / float(pos[i + 1] - pos[i - 1]) * \
+                ((pos[i] - pos[i - 1] + d) * (h[i + 1] - h[i]) / float(pos[i + 1] - pos[i]) +
+                 (pos[i + 1] - pos[i] - d) * (h[i] - h[i - 1]) / float(pos[i] - pos[i - 1]))
+            if not h[i - 1] < hp < h[i + 1]:
+                # linear prediction
+                hp = h[i] + d * (h[i + d] - h[i]) / float(pos[i + d] - pos[i])
+            h[i] = hp
+            pos[i] += d
+
+
+# quantile estimated by a sketch (0. if no values).
+# until the sketch has seen 5 values, it is read from the sorted values.
+def quantile(sk):
+    h = sk["h"]
+    if not h:
+        return 0.
+    if len(h) < 5:
+        return h[int(round(sk["q"] * (len(h) - 1)))]
+    return h[2]
+
+
+if __name__ == "__main__":
+    from random import gauss
+    a, s = new_acc(), new_sketch()
+    for _ in xrange(100000):
+        v = gauss(1., 2.)
+        update_acc(a, v)
+        update_sketch(s, v)
+    print mean(a), variance(a), quantile(s)
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+__author__ = 'Gaetano "Gibbster" Pellegrino'
+
+
+"""
+Utility to translate values into alphabet symbols.
+A symbolizer is built once from the alphabet bounds (dict containing, for each symbol, the left and right bound),
+it stores the sorted edges between symbols and maps whole arrays of values to integer codes with a single bisection.
+The code of a value is the rank of its symbol by left bound.
+get_symbolizer() keeps the symbolizers already built, so that callers translating single values can reuse them.
+"""
+
+
+import numpy as np
+
+
+# symbolizers built by get_symbolizer(), by alphabet bounds
+SYMBOLIZERS = {}
+
+
+# builds a symbolizer: a dict with the sorted symbols ("s"), the inner edges ("e")
+# and the smallest integer type able to hold a code ("dt").
+# symbols must cover contiguous intervals, left-open and right-closed.
+def symbolizer(bounds):
+    sys = sorted(bounds, key=lambda sy: bounds[sy][0])
+    for i in xrange(1, len(sys)):
+        if bounds[sys[i - 1]][1] != bounds[sys[i]][0]:
+            raise ValueError("symbols " + sys[i - 1] + " and " + sys[i] + " are not contiguous")
+    return {"s": sys,
+            "e": np.array([bounds[sy][1] for sy in sys[:-1]], dtype=np.float64),
+            "dt": np.min_scalar_type(len(sys) - 1)}
+
+
+# symbolizer of the alphabet bounds, built only the first time it is requested
+def get_symbolizer(bounds):
+    key = tuple(sorted((sy, tuple(bd)) for sy, bd in bounds.items()))
+    if key not in SYMBOLIZERS:
+        SYMBOLIZERS[key] = symbolizer(bounds)
+    return SYMBOLIZERS[key]
+
+
+# codes of an array of values (value lb < v <= rb gets the code of the symbol bounded by lb and rb)
+def symbolize(sz, values):
+    return np.searchsorted(sz["e"], values, side="left").astype(sz["dt"])
+
+
+# symbol of a single value
+def symbol(sz, value):
+    return sz["s"][int(np.searchsorted(sz["e"], value, side="left"))]
+
+
+if __name__ == "__main__":
+    z = symbolizer({"0": (-float("inf"), 24), "1": (24, 350), "2": (350, float("inf"))})
+    print symbolize(z, np.array([0., 24., 25., 350., 1000.]))
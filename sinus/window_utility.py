@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+__author__ = 'Gaetano "Gibbster" Pellegrino'
+
+
+"""
+Utility to get the sliding windows of a series without copying them.
+A series is loaded into a numpy array once, and all its windows are exposed as a read-only strided view.
+Callers that need to stream get a ring buffer iterator instead.
+"""
+
+
+import series_utility as sru
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+
+# loads a flat file into a numpy array (memory mapped if the file is binary)
+def load_series(path):
+    return sru.load_series(path)
+
+
+# read-only view over all the windows of a series (any numpy array), one per row.
+# a series shorter than wsize gives a single partial window, as rti_utility.windows_getter() does.
+def windows(series, wsize):
+    series = np.ascontiguousarray(series)
+    n = len(series)
+    rows, wsize = (n - wsize + 1, wsize) if n >= wsize else (1, n)
+    sd = series.strides[0]
+    vw = as_strided(series, shape=(rows, wsize), strides=(sd, sd))
+    vw.flags.writeable = False
+    return vw
+
+
+# iterates over the windows of any iterable of values, with the same windows as windows().
+# values are written twice in a ring buffer of 2 * wsize values, so that each window
+# is a contiguous read-only view of it: a window is only valid until the next one is produced.
+def stream_windows(values, wsize):
+    buf = np.empty(2 * wsize, dtype=np.float64)
+    n = 0
+    for vl in values:
+        k = n % wsize
+        buf[k] = buf[k + wsize] = vl
+        n += 1
+        if n >= wsize:
+            k = n % wsize
+            vw = buf[k:k + wsize]
+            vw.flags.writeable = False
+            yield vw
+    # handling a series shorter than wsize
+    if n < wsize:
+        vw = buf[:n]
+        vw.flags.writeable = False
+        yield vw
+
+
+# lines of a sliding window file: each window of the tokens (strings, one per value)
+# is joined with sep, and prefixed by head.
+def window_lines(tokens, wsize, sep=" ", head=""):
+    for row in windows(np.asarray(tokens), wsize):
+        yield head + sep.join(row)
+
+
+if __name__ == "__main__":
+    s = np.arange(10.)
+    print windows(s, 4)
+    for w in stream_windows(s, 4):
+        print w
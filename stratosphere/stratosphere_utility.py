@@ -4,56 +4,208 @@ __author__ = 'Gaetano "Gibbster" Pellegrino'
 
 """
 Utility to work on Stratosphere Zeus data.
+The capture is indexed once by destination address (see get_index()): the index holds the byte offsets
+of the flows of each destination, it is stored next to the capture (PATH + IDX_EXT)
+and rebuilt when the capture changes.
+Arrival dates have a fixed layout (es: 1970/01/01 01:00:00.000000), so they are parsed by numpy
+on whole columns (see parse_times()), as UTC microseconds from the epoch.
+Full scans of the capture are split in byte ranges parsed by WORKERS processes (see range_utility).
 """
 
 
 import matplotlib.pyplot as plt
-from datetime import datetime as dtm
+from os import stat, rename
+from os.path import exists
+import cPickle as pk
+import numpy as np
+import series_utility as sru
+import range_utility as rgu
 
 
 # path to the original zeus capture
 PATH = "/home/nino/PycharmProjects/rai_experiments/stratosphere/zeus_capture.txt"
 
-
-# extracts the delay between consecutive packets (in seconds)
-def extract_delays(ip):
-    with open(PATH, "r") as ih:
-        # skipping the header
-        ih.readline()
-        # starting the extraction
-        first, t0, ps = True, 0, 0
-        for line in ih:
-            fields = line.strip().split(",")
-            # field 6 is the destination address
-            dip = fields[6].strip()
-            # print ps, start, howmany
-            if dip == ip:
-                # field 0 corresponds to the date of arrival
-                # es: 1970/01/01 01:00:00.000000
-                t = int(dtm.strptime(fields[0].strip(), "%Y/%m/%d %H:%M:%S.%f").strftime('%s'))
-                if first:
-                    first = False
-                    t0 = t
-                else:
-                    yield t - t0
-                    t0 = t
-            ps += 1
+# extension of the index of the capture
+IDX_EXT = ".idx"
+
+# index of the capture currently loaded (see get_index())
+INDEX = None
+
+# number of processes scanning the capture (None for all the cores, 1 to scan it in this process)
+WORKERS = None
+
+# destination ips selected by extract_many() and their codes (their positions), see init_times()
+IPS = []
+CODES = {}
+
+# length of the arrival dates, and position of their separators
+STAMP_LEN = 26
+STAMP_SEPS = {4: "/", 7: "/", 10: " ", 13: ":", 16: ":", 19: "."}
+
+
+# size in bytes of the header of the capture
+def header_size():
+    with open(PATH, "rb") as ih:
+        return len(ih.readline())
+
+
+# byte offsets of the flows of each destination address within a byte range of the capture
+# (a numpy int64 array for each address, so that they are sent back compact)
+def index_range(task):
+    path, start, end = task
+    ips = {}
+    for line in rgu.range_lines(path, start, end):
+        # field 6 is the destination address
+        dip = line.split(",", 7)[6].strip()
+        ips.setdefault(dip, []).append(start)
+        start += len(line)
+    return {dip: np.array(ofs, dtype=np.int64) for dip, ofs in ips.iteritems()}
+
+
+# builds the index of the capture: a dict with the "size" and "mtime" of the capture,
+# and the byte offsets of the flows of each destination address ("ips", numpy arrays in file order).
+# the arrays of the ranges are joined once per address at the end.
+def build_index():
+    st = stat(PATH)
+    ips = {}
+    for rips in rgu.imap_ranges(PATH, index_range, workers=WORKERS, start=header_size()):
+        for dip, ofs in rips.iteritems():
+            ips.setdefault(dip, []).append(ofs)
+    ips = {dip: np.concatenate(ofs) for dip, ofs in ips.iteritems()}
+    return {"size": st.st_size, "mtime": st.st_mtime, "ips": ips}
+
+
+# index of the capture, loaded from PATH + IDX_EXT if it is still valid, built and stored otherwise
+def get_index():
+    global INDEX
+    st = stat(PATH)
+    if INDEX is not None and (INDEX["size"], INDEX["mtime"]) == (st.st_size, st.st_mtime):
+        return INDEX
+    ipath = PATH + IDX_EXT
+    if exists(ipath):
+        with open(ipath, "rb") as ih:
+            INDEX = pk.load(ih)
+        if (INDEX["size"], INDEX["mtime"]) == (st.st_size, st.st_mtime):
+            return INDEX
+    INDEX = build_index()
+    # writing a temporary file first, so that an interrupted export does not leave a broken index
+    with open(ipath + ".tmp", "wb") as oh:
+        pk.dump(INDEX, oh, pk.HIGHEST_PROTOCOL)
+    rename(ipath + ".tmp", ipath)
+    return INDEX
+
+
+# rows (lists of fields) of the flows of a destination ip, from the start-th one and howmany of them
+# (all the following ones if howmany is negative). only those rows are read from the capture.
+def rows(ip, start=0, howmany=-1):
+    ofs = get_index()["ips"].get(ip, np.empty(0, dtype=np.int64))
+    ofs = ofs[start:] if howmany < 0 else ofs[start:start + howmany]
+    with open(PATH, "rb") as ih:
+        for of in ofs.tolist():
+            ih.seek(of)
+            yield ih.readline().strip().split(",")
+
+
+# parses arrival dates (es: 1970/01/01 01:00:00.000000) into microseconds from the epoch (numpy int64 array).
+# the digits are read from a byte view of the whole column, and the days are counted from the civil date
+# with the algorithm of H. Hinnant (http://howardhinnant.github.io/date_algorithms.html).
+def parse_times(stamps):
+    bs = np.array(stamps, dtype="S" + str(STAMP_LEN)).view(np.uint8).reshape(-1, STAMP_LEN)
+    for i, sp in STAMP_SEPS.iteritems():
+        if not np.all(bs[:, i] == ord(sp)):
+            raise ValueError("invalid arrival date layout")
+    dg = bs.astype(np.int64) - ord("0")
+
+    # number given by the digits in columns [i, j)
+    def num(i, j):
+        return np.dot(dg[:, i:j], 10 ** np.arange(j - i - 1, -1, -1, dtype=np.int64))
+
+    y, m, d = num(0, 4), num(5, 7), num(8, 10)
+    # days from 1970/01/01, with years starting in march
+    y -= m <= 2
+    era = y // 400
+    yoe = y - era * 400
+    doy = (153 * (m + np.where(m > 2, -3, 9)) + 2) // 5 + d - 1
+    days = era * 146097 + yoe * 365 + yoe // 4 - yoe // 100 + doy - 719468
+    secs = ((days * 24 + num(11, 13)) * 60 + num(14, 16)) * 60 + num(17, 19)
+    return secs * 10 ** 6 + num(20, 26)
+
+
+# delays between consecutive arrival times in microseconds (see parse_times()).
+# they are integer seconds between the truncated times, or float seconds if subsecond is true.
+def delays(us, subsecond=False):
+    if subsecond:
+        return np.diff(us) / 1e6
+    return np.diff(us // 10 ** 6)
+
+
+# extracts the delay between consecutive packets (in seconds, see delays()),
+# from the start-th one and howmany of them (all the following ones if howmany is negative)
+def extract_delays(ip, start=0, howmany=-1, subsecond=False):
+    # the delay k needs the flows k and k + 1, field 0 corresponds to the date of arrival
+    us = parse_times([fields[0].strip() for fields in rows(ip, start, howmany + 1 if howmany >= 0 else -1)])
+    for vl in delays(us, subsecond).tolist():
+        yield vl
 
 
 # number of flows given a destination ip
 def flows(ip):
-    count = 0
-    with open(PATH, "r") as ih:
-        # skipping the header
-        ih.readline()
-        # starting the extraction
-        for line in ih:
-            fields = line.strip().split(",")
-            # field 6 is the destination address
-            dip = fields[6].strip()
-            if dip == ip:
-                count += 1
-    return count
+    return len(get_index()["ips"].get(ip, ()))
+
+
+# sets the destination ips selected for times_range() (once for each worker process)
+def init_times(ips):
+    global IPS, CODES
+    IPS, CODES = ips, {ip: k for k, ip in enumerate(ips)}
+
+
+# arrival times (see parse_times()) of the flows of the selected destination ips (see init_times())
+# within a byte range of the capture.
+# each selected row only keeps an ip code (int32) and its arrival time (int64), the rows are grouped by ip
+# at the end with a stable sort (so that each ip keeps the order of the capture).
+def times_range(task):
+    path, start, end = task
+    codes = CODES
+    cc, cu = [], []
+    for line in rgu.range_lines(path, start, end):
+        # field 6 is the destination address, field 0 the date of arrival
+        fields = line.split(",", 7)
+        k = codes.get(fields[6].strip())
+        if k is not None:
+            cc.append(k)
+            cu.append(fields[0].strip())
+    cs, us = np.array(cc, dtype=np.int32), parse_times(cu)
+    od = np.argsort(cs, kind="mergesort")
+    cs, us = cs[od], us[od]
+    ks = np.unique(cs)
+    bs = np.searchsorted(cs, np.append(ks, len(IPS)))
+    return {IPS[k]: us[bs[i]:bs[i + 1]] for i, k in enumerate(ks.tolist())}
+
+
+# extracts the delays (see delays()) of several destination ips with a single scan of the capture:
+# the given ones, or all the ones with at least min_flows flows. it returns a dict ip -> numpy array.
+# the arrival times of each ip are joined in the order of the ranges, so the delay between the last flow
+# of a range and the first one of the next range is kept.
+def extract_many(ips=None, min_flows=0, subsecond=False):
+    if ips is None:
+        ips = [ip for ip, ofs in get_index()["ips"].iteritems() if len(ofs) >= min_flows]
+    elif min_flows > 0:
+        ips = [ip for ip in ips if flows(ip) >= min_flows]
+    ips, tms = sorted(set(ips)), {}
+    for rtms in rgu.imap_ranges(PATH, times_range, (), WORKERS, header_size(), init_times, (ips,)):
+        for ip, us in rtms.iteritems():
+            tms.setdefault(ip, []).append(us)
+    return {ip: delays(np.concatenate(tms.get(ip, []) + [np.empty(0, dtype=np.int64)]), subsecond) for ip in ips}
+
+
+# exports the delays of several destination ips (see extract_many()) to outdir/<ip><ext>,
+# with ext ".flat" for text or ".bflat" for binary files. it returns a dict ip -> path.
+def export_many(outdir, ips=None, min_flows=0, ext=sru.BFLAT_EXT, subsecond=False):
+    paths = {}
+    for ip, ds in extract_many(ips, min_flows, subsecond).iteritems():
+        paths[ip] = outdir + "/" + ip + ext
+        sru.export_flat(ds, paths[ip])
+    return paths
 
 
 # plots time delays given a destination ip
@@ -66,21 +218,9 @@ def plot_delays(ip):
     plt.show()
 
 
-# flat sequence loader from path
-def load_flat(path):
-    with open(path, "r") as fh:
-        for line in fh:
-            yield float(line.strip())
-
-
 def export_flat(ip, path, start=0, howmany=-1):
-    # export a sinus wave (randomly initialized) of n elements to path
-    with open(path, "w") as oh:
-        ps = 0
-        for vl in extract_delays(ip):
-            if start <= ps and (howmany < 0 or ps - start < howmany):
-                oh.write(str(vl) + "\n")
-            ps += 1
+    # export the delays of ip to path (binary if it ends with .bflat)
+    sru.export_flat([vl for vl in extract_delays(ip, start, howmany)], path)
 
 
 if __name__ == "__main__":
@@ -11,12 +11,15 @@ Each alternative technique must return a prediction for each value within the te
 
 
 import matplotlib.pyplot as plt
-import dot_utility as du
+import automaton_utility as au
 import rti_utility as ru
 import wind.meta as mt
 import hmms_utility as hmu
 import sarimax_utility as sxu
 import pickle as pk
+import series_utility as sru
+import archive_utility as aru
+import numpy as np
 from math import sqrt
 
 
@@ -50,82 +53,92 @@ def rmse(prd, obs):
     return sqrt(sm / float(len(prd)))
 
 
-# flat sequence loader from path
-def load_flat(path):
-    with open(path, "r") as fh:
-        for line in fh:
-            yield float(line.strip())
+# -----------------------------------------------------------------------------------------------------------------
 
 
-# -----------------------------------------------------------------------------------------------------------------
+# target of the predictions name (e.g. "rai.res") of test case tc, within meta.ARCHIVE if it is set
+def prd_path(tc, name):
+    return aru.target(mt.ARCHIVE, tc, name, mt.EXPDIR + "/" + str(tc))
+
+
+# target of the model name (e.g. "rai.dot") of test case tc, within meta.ARCHIVE if it is set (see learn.py)
+def md_path(tc, name):
+    return aru.target(mt.ARCHIVE, tc, name, mt.BASEDIR + "/" + str(tc))
 
 
 # persistence baseline, only requires the flat test file path.
 def persistence(flat_path_ts, flat_out_path):
-    with open(flat_out_path, "w") as oh:
-        prd = 0.
-        for vl in load_flat(flat_path_ts):
-            oh.write(str(prd) + "\n")
-            prd = vl
+    ts = sru.load_series(flat_path_ts)
+    sru.export_res(np.concatenate(([0.], ts[:-1]))[:len(ts)], flat_out_path)
 
 
 # rai and rti only require the flat test file path and a model dot file path.
 # we can use the same method for both techniques because we
 def rairti(dot_path, flat_path_ts, flat_path_out):
-    md = du.load_md(dot_path)
-    with open(flat_path_out, "w") as oh:
-        first_w = True
-        for window in ru.windows_getter(flat_path_ts, mt.WSIZE):
-            sta = 0
-            if first_w:
-                first_w = False
-                for vl in window:
-                    oh.write(str(md[sta]["p"]) + "\n")
-                    # looking for the next state
-                    for _, ds, lg, rg in md[sta]["t"]:
-                        if lg < vl <= rg:
-                            sta = ds
-                            break
-            else:
-                prd = 0.
-                for vl in window:
-                    prd = md[sta]["p"]
-                    # looking for the next state
-                    for _, ds, lg, rg in md[sta]["t"]:
-                        if lg < vl <= rg:
-                            sta = ds
-                            break
-                oh.write(str(prd) + "\n")
+    cm = au.load_md(dot_path)
+    # batch engine: the states of all the windows advance together.
+    # table engine: the predictions of all the symbol windows are enumerated (batch if not possible).
+    # dense engine: batch over dense tables of the values rounded to PRECISION (batch if not possible)
+    if mt.ENGINE in ("batch", "table", "dense"):
+        ts = sru.load_series(flat_path_ts)
+        if mt.ENGINE == "batch":
+            prds = au.predict_batch(cm, ts, mt.WSIZE)
+        elif mt.ENGINE == "table":
+            prds = au.predict_table(cm, ts, mt.ABOUNDS, mt.WSIZE)
+        else:
+            prds, dn = au.predict_dense(cm, ts, mt.PRECISION, mt.WSIZE)
+            if dn is None:
+                print "dense table not available for", dot_path, "-> falling back to bisection"
+        sru.export_res(prds, flat_path_out)
+        return
+    # window engine, the cache one memorizes the transitions shared by the windows
+    ch = au.new_cache(cm) if mt.ENGINE == "cache" else None
+    prds, first_w = [], True
+    for window in ru.windows_getter(flat_path_ts, mt.WSIZE):
+        sta = cm["s0"]
+        if first_w:
+            first_w = False
+            for vl in window:
+                prds.append(cm["p"][sta])
+                # looking for the next state
+                sta = au.step(cm, sta, vl) if ch is None else au.cached_step(ch, sta, vl)
+        else:
+            # the prediction is given by the state reached before the last value
+            sta = au.run(cm, window[:-1], sta) if ch is None else au.cached_run(ch, window[:-1], sta)
+            prds.append(cm["p"][sta])
+    sru.export_res(prds, flat_path_out)
+    if ch is not None:
+        print "transitions cache for", dot_path, "->", au.cache_report(ch)
 
 
 # utility to plot the predictions for a test case identifier [0 to 9 on sinus]
 def plot(test_case):
     # ------------------------------------------------------------------------------
-    rai_path = mt.EXPDIR + "/" + str(test_case) + "/rai.res"
-    rtisy_path = mt.EXPDIR + "/" + str(test_case) + "/rtisy.res"
-    rtitm_path = mt.EXPDIR + "/" + str(test_case) + "/rtitm.res"
-    pers_path = mt.EXPDIR + "/" + str(test_case) + "/pers.res"
-    arma_path = mt.EXPDIR + "/" + str(test_case) + "/arma.res"
-    arima_path = mt.EXPDIR + "/" + str(test_case) + "/arima.res"
-    hmm_path = mt.EXPDIR + "/" + str(test_case) + "/hmm.res"
-    gold_path = mt.BASEDIR + "/" + str(test_case) + "/test.flat"
+    rai_path = prd_path(test_case, "rai.res")
+    rtisy_path = prd_path(test_case, "rtisy.res")
+    rtitm_path = prd_path(test_case, "rtitm.res")
+    pers_path = prd_path(test_case, "pers.res")
+    arma_path = prd_path(test_case, "arma.res")
+    arima_path = prd_path(test_case, "arima.res")
+    hmm_path = prd_path(test_case, "hmm.res")
+    gold_path = sru.series_path(mt.BASEDIR, test_case, "test", mt.FLAT_EXT)
     # ------------------------------------------------------------------------------
     # gold
-    gl = [vl for vl in load_flat(gold_path)]
+    gl = sru.load_series(gold_path).tolist()
     # persistence
-    pr = [vl for vl in load_flat(pers_path)]
+    pr = sru.load_series(pers_path).tolist()
     # RAI
-    ra = [vl for vl in load_flat(rai_path)]
+    ra = sru.load_series(rai_path).tolist()
     # RTI+ symbols
-    rs = [vl for vl in load_flat(rtisy_path)]
+    rs = sru.load_series(rtisy_path).tolist()
     # RTI+ time
-    rt = [vl for vl in load_flat(rtitm_path)]
+    rt = sru.load_series(rtitm_path).tolist()
     # ARIMA
-    ai = [vl for vl in load_flat(arima_path)]
+    ai = sru.load_series(arima_path).tolist()
     # ARMA
-    am = [vl for vl in load_flat(arma_path)]
+    am = sru.load_series(arma_path).tolist()
     # HMM
-    hm = [vl for vl in load_flat(hmm_path)]
+    hm = sru.load_series(hmm_path).tolist()
     # ------------------------------------------------------------------------------
     # now we plot)
     # index
@@ -157,21 +170,21 @@ def store_predictions():
     for tc in mt.TCIDS:
         print "storing predictions for test case", tc
         # setting the paths
-        flat_path_ts = mt.BASEDIR + "/" + str(tc) + "/test.flat"
-        rai_dot = mt.BASEDIR + "/" + str(tc) + "/rai.dot"
-        rtisy_dot = mt.BASEDIR + "/" + str(tc) + "/rtisy.dot"
-        rtitm_dot = mt.BASEDIR + "/" + str(tc) + "/rtitm.dot"
-        arm_md = mt.BASEDIR + "/" + str(tc) + "/arma.bin"
-        ari_md = mt.BASEDIR + "/" + str(tc) + "/arima.bin"
-        hmm_md = mt.BASEDIR + "/" + str(tc) + "/hmm.bin"
+        flat_path_ts = sru.series_path(mt.BASEDIR, tc, "test", mt.FLAT_EXT)
+        rai_dot = md_path(tc, "rai.dot")
+        rtisy_dot = md_path(tc, "rtisy.dot")
+        rtitm_dot = md_path(tc, "rtitm.dot")
+        arm_md = md_path(tc, "arma.bin")
+        ari_md = md_path(tc, "arima.bin")
+        hmm_md = md_path(tc, "hmm.bin")
         # ----------------------------------------------
-        rai_path = mt.EXPDIR + "/" + str(tc) + "/rai.res"
-        rtisy_path = mt.EXPDIR + "/" + str(tc) + "/rtisy.res"
-        rtitm_path = mt.EXPDIR + "/" + str(tc) + "/rtitm.res"
-        pers_path = mt.EXPDIR + "/" + str(tc) + "/pers.res"
-        arma_path = mt.EXPDIR + "/" + str(tc) + "/arma.res"
-        arima_path = mt.EXPDIR + "/" + str(tc) + "/arima.res"
-        hmm_path = mt.EXPDIR + "/" + str(tc) + "/hmm.res"
+        rai_path = prd_path(tc, "rai.res")
+        rtisy_path = prd_path(tc, "rtisy.res")
+        rtitm_path = prd_path(tc, "rtitm.res")
+        pers_path = prd_path(tc, "pers.res")
+        arma_path = prd_path(tc, "arma.res")
+        arima_path = prd_path(tc, "arima.res")
+        hmm_path = prd_path(tc, "hmm.res")
         # calling the right routines
         persistence(flat_path_ts, pers_path)
         rairti(rai_dot, flat_path_ts, rai_path)
@@ -202,38 +215,38 @@ def evaluate():
 
 def evaluate_single(test_case):
     # ------------------------------------------------------------------------------
-    rai_path = mt.EXPDIR + "/" + str(test_case) + "/rai.res"
-    rtisy_path = mt.EXPDIR + "/" + str(test_case) + "/rtisy.res"
-    rtitm_path = mt.EXPDIR + "/" + str(test_case) + "/rtitm.res"
-    pers_path = mt.EXPDIR + "/" + str(test_case) + "/pers.res"
-    arma_path = mt.EXPDIR + "/" + str(test_case) + "/arma.res"
-    arima_path = mt.EXPDIR + "/" + str(test_case) + "/arima.res"
-    hmm_path = mt.EXPDIR + "/" + str(test_case) + "/hmm.res"
-    gold_path = mt.BASEDIR + "/" + str(test_case) + "/test.flat"
+    rai_path = prd_path(test_case, "rai.res")
+    rtisy_path = prd_path(test_case, "rtisy.res")
+    rtitm_path = prd_path(test_case, "rtitm.res")
+    pers_path = prd_path(test_case, "pers.res")
+    arma_path = prd_path(test_case, "arma.res")
+    arima_path = prd_path(test_case, "arima.res")
+    hmm_path = prd_path(test_case, "hmm.res")
+    gold_path = sru.series_path(mt.BASEDIR, test_case, "test", mt.FLAT_EXT)
     # ------------------------------------------------------------------------------
     res = {}
     # gold
-    gl = [vl for vl in load_flat(gold_path)]
+    gl = sru.load_series(gold_path).tolist()
     # persistence
-    pr = [vl for vl in load_flat(pers_path)]
+    pr = sru.load_series(pers_path).tolist()
     res["Persistence"] = {"MAE": mae(pr, gl), "MAPE": mape(pr, gl), "RMSE": rmse(pr, gl)}
     # RAI
-    ra = [vl for vl in load_flat(rai_path)]
+    ra = sru.load_series(rai_path).tolist()
     res["RAI"] = {"MAE": mae(ra, gl), "MAPE": mape(ra, gl), "RMSE": rmse(ra, gl)}
     # RTI+ symbols
-    rs = [vl for vl in load_flat(rtisy_path)]
+    rs = sru.load_series(rtisy_path).tolist()
     res["RTI+ symbols"] = {"MAE": mae(rs, gl), "MAPE": mape(rs, gl), "RMSE": rmse(rs, gl)}
     # RTI+ time
-    rt = [vl for vl in load_flat(rtitm_path)]
+    rt = sru.load_series(rtitm_path).tolist()
     res["RTI+ time"] = {"MAE": mae(rt, gl), "MAPE": mape(rt, gl), "RMSE": rmse(rt, gl)}
     # ARIMA
-    ai = [vl for vl in load_flat(arima_path)]
+    ai = sru.load_series(arima_path).tolist()
     res["ARIMA"] = {"MAE": mae(ai, gl), "MAPE": mape(ai, gl), "RMSE": rmse(ai, gl)}
     # ARMA
-    am = [vl for vl in load_flat(arma_path)]
+    am = sru.load_series(arma_path).tolist()
     res["ARMA"] = {"MAE": mae(am, gl), "MAPE": mape(am, gl), "RMSE": rmse(am, gl)}
     # HMM
-    hm = [vl for vl in load_flat(hmm_path)]
+    hm = sru.load_series(hmm_path).tolist()
     res["HMM"] = {"MAE": mae(hm, gl), "MAPE": mape(hm, gl), "RMSE": rmse(hm, gl)}
     # ------------------------------------------------------------------------------
     for tn in res:
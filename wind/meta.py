@@ -50,6 +50,29 @@ ABOUNDS = {"0": (-float("inf"), 0.59),
            "6": (2.76, 3.33),
            "7": (3.33, float("inf"))}
 
+# extension of the train and test series (".flat" for text, ".bflat" for binary, see series_utility).
+# with ".bflat", test cases set up before still read their text series
+FLAT_EXT = ".flat"
+
+# if true, the train and test series of all the test cases are views of a single master series (BASEDIR/master.bflat),
+# otherwise they are files in the test case directories (see series_utility)
+VIEWS = True
+
+# number of processes running the learning jobs in learn.py (None for all the cores, 1 to run them in order).
+# with more processes, the HMMs of the test cases are learned from per test case random states
+# (seeded by hmms_utility.SEED and the test case), so they differ from the ones learned in order
+LEARN_WORKERS = 1
+
+# if true, each learning process (and the learners it calls) is pinned to its own core (with taskset)
+PIN_CPUS = False
+
+# SQLite archive storing the models and the predictions of all the test cases (see archive_utility),
+# None to store them in the test case directories of BASEDIR and EXPDIR
+ARCHIVE = None
+
+# engine running the automata in evaluate.py ("window", "cache", "batch", "table" or "dense")
+ENGINE = "batch"
+
 # RTI+ bash command (used in learn.py)
 RTI_CMD = "/home/nino/bin/RTI/build/rti 1 0.05 {TRAIN} > {MODEL}"
 
@@ -5,11 +5,20 @@ __author__ = 'Gaetano "Gibbster" Pellegrino'
 
 """
 Utility to plug Rijnhaven wind speed data into our experiments.
+The file is split in byte ranges parsed by WORKERS processes (see range_utility).
+The hourly wind speeds are parsed once and cached next to the file (PATH + CACHE_EXT, see hourly_wspeed()).
+Any column can also be aggregated at several resolutions (see pyramid()): each level holds the sums and counts
+of the valid data in consecutive groups, it is cached next to the file and built from a finer level when possible.
 """
 
 
 import matplotlib.pyplot as plt
 from math import isnan
+from os import stat, rename
+from os.path import exists
+import numpy as np
+import series_utility as sru
+import range_utility as rgu
 
 
 # path to the original rijnhaven file
@@ -18,25 +27,150 @@ PATH = "/home/nino/Scaricati/Rijnhaven.csv"
 # average wind speed field
 FOI = 13
 
+# number of data in an hour (each datum is about a average of 5 minutes)
+HOUR = 12
+
+# number of processes parsing the file (None for all the cores, 1 to parse it in this process)
+WORKERS = None
+
+# extension of the cache of the hourly wind speeds
+CACHE_EXT = ".hourly.npz"
+
+# hourly wind speeds currently loaded, with the key of their cache (see hourly_wspeed())
+HOURLY = None
+
+# number of data aggregated by the default levels of the pyramid (see pyramid())
+LEVELS = {"hourly": HOUR, "3-hourly": 3 * HOUR, "daily": 24 * HOUR}
+
+# extension of the cache of a level of the pyramid (PATH.<column>.<number of data> + LEVEL_EXT)
+LEVEL_EXT = ".npz"
+
+
+# valid values of field foi within a byte range of the file
+def values_range(task):
+    path, start, end, foi = task
+    vls = []
+    for line in rgu.range_lines(path, start, end):
+        fields = line.strip().split(",")
+        if len(fields) >= foi and fields[foi] != "\"NAN\"" and not isnan(float(fields[foi])):
+            vls.append(float(fields[foi]))
+    return np.array(vls, dtype=np.float64)
+
 
 def extract_hourly_wspeed():
-    with open(PATH, "r") as ih:
-        hour = []
-        for line in ih:
-            fields = line.strip().split(",")
-            # print fields
-            if len(fields) >= FOI and fields[FOI] != "\"NAN\"" and not isnan(float(fields[FOI])):
-                # each datum is about a average of 5 minutes, so we need 12 of them to cover 1 hour
-                if len(hour) < 12:
-                    hour.append(float(fields[FOI]))
-                else:
-                    yield sum(hour) / 12.
-                    hour = []
+    # each datum is about a average of 5 minutes, so we need 12 of them to cover 1 hour,
+    # and the datum following an hour is skipped. the partial hour of a range is carried to the next one.
+    rest = np.empty(0, dtype=np.float64)
+    for vls in rgu.imap_ranges(PATH, values_range, (FOI,), WORKERS):
+        vls = np.concatenate((rest, vls))
+        m = len(vls) // (HOUR + 1)
+        hours, rest = vls[:m * (HOUR + 1)].reshape(m, HOUR + 1), vls[m * (HOUR + 1):]
+        # summing the data one at a time, as sum() would do on each hour
+        sm = hours[:, 0].copy()
+        for j in xrange(1, HOUR):
+            sm += hours[:, j]
+        for vl in (sm / float(HOUR)).tolist():
+            yield vl
+
+
+# hourly wind speeds as a numpy array. they are read from PATH + CACHE_EXT when the file did not change
+# since they were cached (same size, modification time and FOI), parsed and cached otherwise.
+def hourly_wspeed():
+    global HOURLY
+    st = stat(PATH)
+    ky = (st.st_size, st.st_mtime, FOI)
+    if HOURLY is not None and HOURLY[0] == ky:
+        return HOURLY[1]
+    cp = PATH + CACHE_EXT
+    if exists(cp):
+        with np.load(cp) as ch:
+            if (int(ch["size"]), float(ch["mtime"]), int(ch["foi"])) == ky:
+                HOURLY = ky, ch["vls"]
+                return HOURLY[1]
+    vls = np.fromiter(extract_hourly_wspeed(), dtype=np.float64)
+    # writing a temporary file first, so that an interrupted export does not leave a broken cache
+    with open(cp + ".tmp", "wb") as ch:
+        np.savez(ch, size=np.array(st.st_size), mtime=np.array(st.st_mtime), foi=np.array(FOI), vls=vls)
+    rename(cp + ".tmp", cp)
+    HOURLY = ky, vls
+    return vls
+
+
+# values of column col within a byte range of the file, "NAN" values included as nan
+def raw_range(task):
+    path, start, end, col = task
+    vls = []
+    for line in rgu.range_lines(path, start, end):
+        fields = line.strip().split(",")
+        if len(fields) > col:
+            if fields[col] == "\"NAN\"":
+                vls.append(float("nan"))
+                continue
+            try:
+                vls.append(float(fields[col]))
+            except ValueError:
+                # header lines
+                pass
+    return np.array(vls, dtype=np.float64)
+
+
+# all the values (one for each 5 minutes) of column col, "NAN" values included as nan
+def extract_raw(col=None):
+    return np.concatenate([vls for vls in rgu.imap_ranges(PATH, raw_range, (FOI if col is None else col,), WORKERS)] +
+                          [np.empty(0, dtype=np.float64)])
+
+
+# sums and counts of the valid values in consecutive groups of k values (the last partial group is dropped)
+def group_sums(vls, k):
+    m = len(vls) // k
+    gs = vls[:m * k].reshape(m, k)
+    vd = ~np.isnan(gs)
+    return np.where(vd, gs, 0.).sum(axis=1), vd.sum(axis=1)
+
+
+# level of the pyramid with groups of k values of column col (FOI by default), as sums and counts of the valid values.
+# it is read from its cache when the file did not change (same size and modification time),
+# built from the hourly level when k is a multiple of HOUR, from the raw values otherwise.
+def level_sums(k, col=None):
+    col = FOI if col is None else col
+    st = stat(PATH)
+    cp = PATH + "." + str(col) + "." + str(k) + LEVEL_EXT
+    if exists(cp):
+        with np.load(cp) as ch:
+            if (int(ch["size"]), float(ch["mtime"])) == (st.st_size, st.st_mtime):
+                return ch["sums"], ch["counts"]
+    if k != HOUR and k % HOUR == 0:
+        sums, counts = level_sums(HOUR, col)
+        m, r = len(sums) // (k // HOUR), k // HOUR
+        sums, counts = sums[:m * r].reshape(m, r).sum(axis=1), counts[:m * r].reshape(m, r).sum(axis=1)
+    else:
+        sums, counts = group_sums(extract_raw(col), k)
+    # writing a temporary file first, so that an interrupted export does not leave a broken cache
+    with open(cp + ".tmp", "wb") as ch:
+        np.savez(ch, size=np.array(st.st_size), mtime=np.array(st.st_mtime), sums=sums, counts=counts)
+    rename(cp + ".tmp", cp)
+    return sums, counts
+
+
+# means of the valid values of column col (FOI by default) in consecutive groups of k values (nan if none is valid)
+def aggregate(k, col=None):
+    sums, counts = level_sums(k, col)
+    mns = sums / np.maximum(counts, 1)
+    mns[counts == 0] = np.nan
+    return mns
+
+
+# aggregates column col (FOI by default) at several resolutions, given as a dict name -> number of values
+# (LEVELS by default). it returns a dict name -> means (see aggregate()).
+# the finest levels come first, so that the coarser ones are built from them.
+def pyramid(col=None, levels=None):
+    levels = LEVELS if levels is None else levels
+    return {nm: aggregate(k, col) for nm, k in sorted(levels.iteritems(), key=lambda x: x[1])}
 
 
 # plots hourly wind speed
 def plot_hourly_wspeed():
-    vy = [v for v in extract_hourly_wspeed()]
+    vy = hourly_wspeed().tolist()
     vx = [i for i in xrange(len(vy))]
     plt.title('Hourly Wind Speed (m/s)')
     plt.plot(vx, vy)
@@ -44,21 +178,10 @@ def plot_hourly_wspeed():
     plt.show()
 
 
-# flat sequence loader from path
-def load_flat(path):
-    with open(path, "r") as fh:
-        for line in fh:
-            yield float(line.strip())
-
-
 def export_flat(path, start=0, howmany=-1):
-    # exports wind speed data to path
-    with open(path, "w") as oh:
-        ps = 0
-        for vl in extract_hourly_wspeed():
-            if start <= ps and (howmany < 0 or ps - start < howmany):
-                oh.write(str(vl) + "\n")
-            ps += 1
+    # exports wind speed data to path (binary if it ends with .bflat)
+    vls = hourly_wspeed()
+    sru.export_flat(vls[start:] if howmany < 0 else vls[start:start + howmany], path)
 
 
 if __name__ == "__main__":
@@ -9,12 +9,14 @@ It creates 10 training sinus series of 1000 values each,
 and 10 testing sinus series of 500 values each.
 It generates a folder for each case (0 to 9).
 The file format for the series consists of a value for each row in a text file with .flat extension
-(train.flat, test.flat).
+(train.flat, test.flat), or of raw values in a binary file with .bflat extension (see meta.FLAT_EXT).
+With meta.VIEWS, train and test series are views of a single master series instead (BASEDIR/master.bflat).
 """
 
 import wind.meta as mt
-import rai_utility as rai
+import export_utility as exu
 import rti_utility as rti
+import series_utility as sru
 import rijnhaven_utility as su
 from os import mkdir, walk, rmdir, remove
 from os.path import exists, join
@@ -34,6 +36,9 @@ def clean():
             remove(join(root, name))
         for name in dirs:
             rmdir(join(root, name))
+    # removes the archive of the models and predictions at once
+    if mt.ARCHIVE is not None and exists(mt.ARCHIVE):
+        remove(mt.ARCHIVE)
     # removes the base directories
     if exists(mt.BASEDIR):
         rmdir(mt.BASEDIR)
@@ -45,7 +50,7 @@ def get_starting_points():
     # get starting points where to start gathering data within the capture file
     # -------------------------------------------------------------------------
     seed(mt.SEED)
-    selected, data_points = [], sum([1 for _ in su.extract_hourly_wspeed()])
+    selected, data_points = [], len(su.hourly_wspeed())
     for _ in mt.TCIDS:
         found = False
         while not found:
@@ -84,6 +89,15 @@ def setup():
         mkdir(mt.BASEDIR)
     if not exists(mt.EXPDIR):
         mkdir(mt.EXPDIR)
+    # with views, the series of the test cases are ranges of the whole series
+    if mt.VIEWS:
+        master = mt.BASEDIR + "/master" + sru.BFLAT_EXT
+        su.export_flat(master)
+        sru.export_views({tc: {"train": sru.view_path(master, spoints[tc][0], mt.TRAINL),
+                               "test": sru.view_path(master, spoints[tc][1], mt.TESTL)}
+                          for tc in mt.TCIDS}, mt.BASEDIR)
+    elif exists(mt.BASEDIR + "/" + sru.VIEWS):
+        remove(mt.BASEDIR + "/" + sru.VIEWS)
     # now we can start
     for tc in mt.TCIDS:
         print "setting up test case", tc
@@ -99,20 +113,17 @@ def setup():
         if not exists(expdir):
             mkdir(expdir)
         # setting the training paths
-        flat = tcdir + "/train.flat"
+        flat = sru.series_path(mt.BASEDIR, tc, "train", mt.FLAT_EXT)
         raisw = tcdir + "/rai.sw"
         rtissw = tcdir + "/rtisy.sw"
         rtitsw = tcdir + "/rtitm.sw"
-        # generating the training flat wave file
-        su.export_flat(flat, tr_start, mt.TRAINL)
-        # generating the testing flat wave file
-        su.export_flat(tcdir + "/test.flat", ts_start, mt.TESTL)
-        # generating training slided file for RAI
-        rai.export_sw(flat, mt.WSIZE, raisw)
-        # generating training slided file for RTI with alphabet
-        rti.export_alpha_sw(flat, mt.WSIZE, rtissw)
-        # generating training slided file for RTI with time
-        rti.export_time_sw(flat, mt.WSIZE, rtitsw)
+        if not mt.VIEWS:
+            # generating the training flat wave file
+            su.export_flat(flat, tr_start, mt.TRAINL)
+            # generating the testing flat wave file
+            su.export_flat(tcdir + "/test" + mt.FLAT_EXT, ts_start, mt.TESTL)
+        # generating training slided files for RAI, RTI with alphabet and RTI with time (in a single pass)
+        exu.export_sws(flat, mt.WSIZE, {"rai": raisw, "rtisy": rtissw, "rtitm": rtitsw})
 
 
 if __name__ == "__main__":